@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Measure model classes preparation time in a project with many models,
+some of them having FSM fields
+
+    python benchmarks/startup.py [plain models] [fsm models] [transitions per model]
+"""
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.apps.registry import Apps  # noqa: E402
+from django.db import models  # noqa: E402
+from django_fsm import FSMField, transition  # noqa: E402
+
+
+def make_transition(index):
+    @transition(field="state", source="state_%d" % index, target="state_%d" % (index + 1))
+    def method(self):
+        pass
+
+    method.__name__ = "transition_%d" % index
+    return method
+
+
+def make_model(apps, name, fsm_transitions=None):
+    attrs = {
+        "__module__": __name__,
+        "Meta": type("Meta", (), {"app_label": "benchmarks", "apps": apps}),
+        "text": models.CharField(max_length=50),
+    }
+    if fsm_transitions is not None:
+        attrs["state"] = FSMField(default="state_0")
+        for index in range(fsm_transitions):
+            attrs["transition_%d" % index] = make_transition(index)
+    return type(name, (models.Model,), attrs)
+
+
+def main(plain_models=900, fsm_models=70, transitions=20):
+    # transitions are collected on class_prepared, so class creation
+    # times include it on any revision
+    apps = Apps()
+    start = time.time()
+    for index in range(fsm_models):
+        make_model(apps, "FSMModel%d" % index, transitions)
+    fsm_done = time.time()
+    for index in range(plain_models):
+        make_model(apps, "PlainModel%d" % index)
+    plain_done = time.time()
+
+    print("%d fsm models with %d transitions: %.3fs" % (fsm_models, transitions, fsm_done - start))
+    print("%d plain models after them: %.3fs" % (plain_models, plain_done - fsm_done))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
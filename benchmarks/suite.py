@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite for the transition hot paths, runs against in-memory SQLite
+
+    python benchmarks/suite.py run [-o results.json] [-k name] [--quick]
+    python benchmarks/suite.py compare before.json after.json
+
+Each benchmark reports the best time per operation over a few repeats.
+Store the results of two revisions with -o and compare them. Benchmarks
+of APIs missing in the measured revision are skipped.
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.apps.registry import Apps  # noqa: E402
+from django.contrib.auth.models import Permission, User  # noqa: E402
+from django.contrib.contenttypes.models import ContentType  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, models, transaction  # noqa: E402
+
+from django_fsm import (  # noqa: E402
+    ConcurrentTransition,
+    ConcurrentTransitionMixin,
+    FSMField,
+    can_proceed,
+    has_transition_perm,
+    transition,
+)
+from django_fsm.signals import post_transition, pre_transition  # noqa: E402
+
+MANY_TRANSITIONS = 100
+LARGE_MACHINE_STATES = 300
+
+
+def make_transition(name, source, target, **kwargs):
+    @transition(field="state", source=source, target=target, **kwargs)
+    def method(self):
+        pass
+
+    method.__name__ = name
+    return method
+
+
+class SuitePost(models.Model):
+    state = FSMField(default="new")
+    text = models.CharField(max_length=50, default="text")
+
+    @transition(field=state, source="*", target="published")
+    def publish(self):
+        pass
+
+    @transition(field=state, source="*", target="published", permission="benchmarks.can_publish_suitepost")
+    def publish_with_permission(self):
+        pass
+
+    class Meta:
+        app_label = "benchmarks"
+
+
+def make_many_transitions_model():
+    attrs = {
+        "__module__": __name__,
+        "Meta": type("Meta", (), {"app_label": "benchmarks"}),
+        "state": FSMField(default="new"),
+    }
+    for index in range(MANY_TRANSITIONS):
+        attrs["go_%d" % index] = make_transition("go_%d" % index, "new", "state_%d" % index)
+        attrs["back_%d" % index] = make_transition("back_%d" % index, "state_%d" % index, "new")
+    attrs["cancel"] = make_transition("cancel", "*", "cancelled")
+    attrs["block"] = make_transition("block", "+", "blocked")
+    return type("ManyTransitionsPost", (models.Model,), attrs)
+
+
+def make_large_machine_model():
+    attrs = {
+        "__module__": __name__,
+        "Meta": type("Meta", (), {"app_label": "benchmarks"}),
+        "state": FSMField(default="state_0"),
+    }
+    for index in range(LARGE_MACHINE_STATES):
+        name = "step_%d" % index
+        attrs[name] = make_transition(
+            name, "state_%d" % index, "state_%d" % (index + 1), on_error="failed_%d" % (index % 10)
+        )
+    for index in range(5):
+        name = "cancel_%d" % index
+        attrs[name] = make_transition(name, "*", "cancelled_%d" % index)
+        name = "block_%d" % index
+        attrs[name] = make_transition(name, "+", "blocked_%d" % index)
+    return type("LargeMachinePost", (models.Model,), attrs)
+
+
+class ReceiversPost(models.Model):
+    state = FSMField(default="new")
+
+    @transition(field=state, source="*", target="published")
+    def publish(self):
+        pass
+
+    class Meta:
+        app_label = "benchmarks"
+
+
+ManyTransitionsPost = make_many_transitions_model()
+LargeMachinePost = make_large_machine_model()
+
+
+class ConcurrentPost(ConcurrentTransitionMixin, models.Model):
+    state = FSMField(default="new")
+
+    @transition(field=state, source="*", target="published")
+    def publish(self):
+        pass
+
+    class Meta:
+        app_label = "benchmarks"
+
+
+def setup_database():
+    call_command("migrate", run_syncdb=True, verbosity=0)
+    with connection.schema_editor() as editor:
+        for model in (SuitePost, ReceiversPost, ManyTransitionsPost, LargeMachinePost, ConcurrentPost):
+            editor.create_model(model)
+
+
+BENCHMARKS = []
+
+
+class Skip(Exception):
+    pass
+
+
+def optional(module_name, name):
+    """
+    Looks up an API that older revisions may not have, skipping the benchmark
+    """
+    try:
+        return getattr(importlib.import_module(module_name), name)
+    except (ImportError, AttributeError):
+        raise Skip("%s.%s is not available" % (module_name, name))
+
+
+def benchmark(number):
+    def decorator(func):
+        BENCHMARKS.append((func.__name__, func, number))
+        return func
+
+    return decorator
+
+
+@benchmark(number=1000000)
+def plain_field_read():
+    post = SuitePost()
+    return lambda: post.text
+
+
+@benchmark(number=1000000)
+def descriptor_read():
+    post = SuitePost()
+    return lambda: post.state
+
+
+@benchmark(number=200000)
+def change_state():
+    post = SuitePost()
+    return post.publish
+
+
+def receiver(sender, **kwargs):
+    pass
+
+
+@benchmark(number=200000)
+def change_state_with_receivers():
+    post = ReceiversPost()
+    pre_transition.connect(receiver, sender=ReceiversPost)
+    post_transition.connect(receiver, sender=ReceiversPost)
+    return post.publish
+
+
+@benchmark(number=200000)
+def can_proceed_call():
+    post = SuitePost()
+    return lambda: can_proceed(post.publish)
+
+
+@benchmark(number=100000)
+def has_transition_perm_call():
+    post = SuitePost.objects.create()
+    user = User.objects.create(username="publisher")
+    permission = Permission.objects.create(
+        codename="can_publish_suitepost",
+        name="Can publish",
+        content_type=ContentType.objects.get_for_model(SuitePost),
+    )
+    user.user_permissions.add(permission)
+    user = User.objects.get(pk=user.pk)
+    return lambda: has_transition_perm(post.publish_with_permission, user)
+
+
+@benchmark(number=2000)
+def get_available_many_transitions():
+    post = ManyTransitionsPost()
+    return lambda: list(post.get_available_state_transitions())
+
+
+@benchmark(number=2000)
+def get_all_many_transitions():
+    post = ManyTransitionsPost()
+    return lambda: list(post.get_all_state_transitions())
+
+
+@benchmark(number=5000)
+def concurrent_save():
+    post = ConcurrentPost.objects.create()
+    return post.save
+
+
+@benchmark(number=5000)
+def concurrent_save_conflict():
+    post = ConcurrentPost.objects.create()
+    ConcurrentPost.objects.filter(pk=post.pk).update(state="published")
+
+    def save():
+        try:
+            with transaction.atomic():
+                post.save()
+        except ConcurrentTransition:
+            pass
+
+    return save
+
+
+@benchmark(number=5)
+def model_classes_startup():
+    # transitions are collected on class_prepared, on any revision
+    from benchmarks.startup import make_model
+
+    def create():
+        apps = Apps()
+        for index in range(50):
+            make_model(apps, "StartupModel%d" % index, 20)
+        for index in range(200):
+            make_model(apps, "StartupPlainModel%d" % index)
+
+    return create
+
+
+@benchmark(number=3)
+def generate_dot_large_machine():
+    generate_dot = optional("django_fsm.management.commands.graph_transitions", "generate_dot")
+    fields_data = [(LargeMachinePost._meta.get_field("state"), LargeMachinePost)]
+    return lambda: generate_dot(fields_data).source
+
+
+@benchmark(number=200)
+def plan_transitions_large_machine():
+    plan_transitions = optional("django_fsm", "plan_transitions")
+    post = LargeMachinePost()
+    return lambda: plan_transitions(post, "state_%d" % LARGE_MACHINE_STATES, check_conditions=True)
+
+
+@benchmark(number=100000)
+def plan_transitions_memoised():
+    plan_transitions = optional("django_fsm", "plan_transitions")
+    post = LargeMachinePost()
+    return lambda: plan_transitions(post, "state_%d" % LARGE_MACHINE_STATES)
+
+
+def get_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def run(output=None, keyword=None, quick=False, repeat=5):
+    setup_database()
+    results = {}
+    for name, setup, number in BENCHMARKS:
+        if keyword and keyword not in name:
+            continue
+        if quick:
+            number, repeat = max(1, number // 100), 1
+        try:
+            func = setup()
+        except Skip as exc:
+            print("%-34s %15s" % (name, "skipped: %s" % exc))
+            continue
+        best = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+        results[name] = {"seconds": best, "number": number, "repeat": repeat}
+        print("%-34s %12.3f us" % (name, best * 1e6))
+
+    if output:
+        data = {
+            "revision": get_revision(),
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "results": results,
+        }
+        with open(output, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+    return results
+
+
+def compare(before, after):
+    with open(before) as f:
+        before = json.load(f)
+    with open(after) as f:
+        after = json.load(f)
+
+    print("%-34s %12s %12s %8s" % ("", before["revision"] or "before", after["revision"] or "after", "ratio"))
+    for name in sorted(set(before["results"]) | set(after["results"])):
+        old, new = before["results"].get(name), after["results"].get(name)
+        if old is None or new is None:
+            print("%-34s %12s %12s" % (
+                name,
+                "-" if old is None else "%.3f" % (old["seconds"] * 1e6),
+                "-" if new is None else "%.3f" % (new["seconds"] * 1e6),
+            ))
+            continue
+        print("%-34s %12.3f %12.3f %7.2fx" % (
+            name, old["seconds"] * 1e6, new["seconds"] * 1e6, old["seconds"] / new["seconds"]
+        ))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="django-fsm benchmarks, times are per operation in microseconds")
+    subparsers = parser.add_subparsers(dest="command")
+    run_parser = subparsers.add_parser("run")
+    run_parser.add_argument("--output", "-o", help="Store results to the JSON file")
+    run_parser.add_argument("-k", dest="keyword", help="Run only benchmarks with the keyword in the name")
+    run_parser.add_argument("--quick", action="store_true", help="Run each benchmark a few times, to check it works")
+    compare_parser = subparsers.add_parser("compare")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        compare(args.before, args.after)
+    else:
+        run(
+            output=getattr(args, "output", None),
+            keyword=getattr(args, "keyword", None),
+            quick=getattr(args, "quick", False),
+        )
+
+
+if __name__ == "__main__":
+    main()
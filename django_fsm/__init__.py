@@ -3,15 +3,29 @@
 State tracking functionality for django models
 """
 import inspect
-import sys
-from functools import wraps
+import operator
+import random
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from functools import reduce, wraps
 
 import django
-from django.db import models
-from django.db.models import Field
+from django.contrib.auth import get_backends
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied
+from django.db import models, transaction
+from django.db.models import Case, Count, Field, Q, TextField, Value, When
+from django.db.models.functions import Concat
 from django.db.models.query_utils import DeferredAttribute
 from django.db.models.signals import class_prepared
-from django_fsm.signals import pre_transition, post_transition
+from django_fsm.graph import StateGraph
+from django_fsm.signals import (
+    pre_transition,
+    post_transition,
+    pre_bulk_transition,
+    post_bulk_transition,
+)
 
 try:
     from functools import partialmethod
@@ -29,7 +43,6 @@ try:
 except ImportError:
     from django.db.models.loading import get_model
 
-
 __all__ = [
     "TransitionNotAllowed",
     "ConcurrentTransition",
@@ -38,9 +51,15 @@ __all__ = [
     "FSMIntegerField",
     "FSMKeyField",
     "ConcurrentTransitionMixin",
+    "FSMQuerySet",
     "transition",
     "can_proceed",
     "has_transition_perm",
+    "bulk_get_available_user_transitions",
+    "condition",
+    "condition_cache",
+    "run_transition",
+    "plan_transitions",
     "GET_STATE",
     "RETURN_VALUE",
 ]
@@ -63,25 +82,6 @@ def show_deprecation_warning():
 show_deprecation_warning()
 
 
-if sys.version_info[:2] == (2, 6):
-    # Backport of Python 2.7 inspect.getmembers,
-    # since Python 2.6 ships buggy implementation
-    def __getmembers(object, predicate=None):
-        """Return all members of an object as (name, value) pairs sorted by name.
-        Optionally, only return members that satisfy a given predicate."""
-        results = []
-        for key in dir(object):
-            try:
-                value = getattr(object, key)
-            except AttributeError:
-                continue
-            if not predicate or predicate(value):
-                results.append((key, value))
-        results.sort()
-        return results
-
-    inspect.getmembers = __getmembers
-
 # South support; see http://south.aeracode.org/docs/tutorial/part4.html#simple-inheritance
 try:
     from south.modelsinspector import add_introspection_rules
@@ -93,6 +93,16 @@ else:
     add_introspection_rules([], [r"^django_fsm\.FSMKeyField"])
 
 
+# python < 3.5 has no coroutines
+iscoroutinefunction = getattr(inspect, "iscoroutinefunction", lambda func: False)
+
+
+def _has_listeners(signal, sender):
+    # Signal.has_listeners takes a lock and resolves the receivers on each
+    # call, skip it when nothing is connected at all
+    return bool(signal.receivers) and signal.has_listeners(sender)
+
+
 class TransitionNotAllowed(Exception):
     """Raised when a transition is not allowed"""
 
@@ -111,8 +121,60 @@ class ConcurrentTransition(Exception):
     Raised when the transition cannot be executed because the
     object has become stale (state has been changed since it
     was fetched from the database).
+
+    `current_states` holds the {attname: value} of the state fields
+    as they are currently stored in the database.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.object = kwargs.pop("object", None)
+        self.current_states = kwargs.pop("current_states", None)
+        super(ConcurrentTransition, self).__init__(*args, **kwargs)
+
+
+def condition(cacheable=True, cost=0, q=None):
+    """
+    Decorator to annotate a transition condition.
+
+    Set cacheable to False if the condition result can change while
+    available transitions are evaluated. Conditions with a lower cost are
+    checked first.
+
+    Set q to the Q object selecting the same rows the condition accepts, to
+    let FSMQuerySet methods check the condition in the database.
     """
 
+    def inner_condition(func):
+        func.cacheable = cacheable
+        func.cost = cost
+        func.q = q
+        return func
+
+    return inner_condition
+
+
+_condition_cache = threading.local()
+
+
+@contextmanager
+def condition_cache():
+    """
+    Context manager to reuse condition results until exit,
+    ex: for the duration of a request.
+
+    Cached results are not invalidated by transitions made within the block.
+    """
+    previous = getattr(_condition_cache, "cache", None)
+    _condition_cache.cache = {} if previous is None else previous
+    try:
+        yield
+    finally:
+        _condition_cache.cache = previous
+
+
+def get_condition_cache():
+    return getattr(_condition_cache, "cache", None)
+
 
 class Transition(object):
     def __init__(
@@ -125,11 +187,47 @@ class Transition(object):
         self.conditions = conditions
         self.permission = permission
         self.custom = custom
+        self.ordered_conditions = sorted(
+            conditions or [], key=lambda condition: getattr(condition, "cost", 0)
+        )
 
     @property
     def name(self):
         return self.method.__name__
 
+    def conditions_met(self, instance, cache=None):
+        """
+        Check if all conditions have been met
+
+        Results of cacheable conditions are stored in and reused from `cache`
+        """
+        for condition in self.ordered_conditions:
+            if cache is None or not getattr(condition, "cacheable", True):
+                result = condition(instance)
+            else:
+                # keep the instance alive, so its id can't be reused
+                key = (id(condition), id(instance))
+                if key in cache:
+                    result = cache[key][1]
+                else:
+                    result = condition(instance)
+                    cache[key] = (instance, result)
+            if not result:
+                return False
+        return True
+
+    def get_conditions_q(self):
+        """
+        Returns Q for all conditions, or None if some condition has no `q`
+        """
+        result = Q()
+        for condition in self.conditions or []:
+            q = getattr(condition, "q", None)
+            if q is None:
+                return None
+            result &= q
+        return result
+
     def has_perm(self, instance, user):
         if not self.permission:
             return True
@@ -160,14 +258,13 @@ def get_available_FIELD_transitions(instance, field):
     with all conditions met
     """
     curr_state = field.get_state(instance)
-    transitions = field.transitions[instance.__class__]
+    cache = get_condition_cache()
+    if cache is None:
+        cache = {}
 
-    for name, transition in transitions.items():
-        meta = transition._django_fsm
-        if meta.has_transition(curr_state) and meta.conditions_met(
-            instance, curr_state
-        ):
-            yield meta.get_transition(curr_state)
+    for transition in field.get_state_transitions(instance.__class__, curr_state):
+        if transition.conditions_met(instance, cache):
+            yield transition
 
 
 def get_all_FIELD_transitions(instance, field):
@@ -187,6 +284,105 @@ def get_available_user_FIELD_transitions(instance, user, field):
             yield transition
 
 
+def _bulk_user_has_perm(user, permission, objs):
+    """
+    Returns [bool] for each object if user has the object permission.
+
+    Authentication backends could implement `bulk_has_perm(user_obj, perm, objs)`
+    returning [bool] to resolve permissions for many objects at once.
+    """
+    granted = [False] * len(objs)
+    pending = list(range(len(objs)))
+
+    for backend in get_backends():
+        if not pending:
+            break
+
+        if hasattr(backend, "bulk_has_perm"):
+            try:
+                results = backend.bulk_has_perm(
+                    user, permission, [objs[index] for index in pending]
+                )
+            except PermissionDenied:
+                break
+            denied = set()
+        elif hasattr(backend, "has_perm"):
+            results, denied = [], set()
+            for index in pending:
+                try:
+                    results.append(backend.has_perm(user, permission, objs[index]))
+                except PermissionDenied:
+                    results.append(False)
+                    denied.add(index)
+        else:
+            continue
+
+        for index, result in zip(pending, results):
+            granted[index] = bool(result)
+        pending = [
+            index
+            for index in pending
+            if not granted[index] and index not in denied
+        ]
+
+    return granted
+
+
+def bulk_get_available_user_transitions(instances, user, field_name):
+    """
+    List of transitions available for each instance with all conditions
+    met and user have rights on it.
+
+    Each global permission is checked once, object permissions are checked
+    once per permission for all instances requiring it.
+    """
+    instances = list(instances)
+    available = [
+        list(
+            get_available_FIELD_transitions(
+                instance, instance._meta.get_field(field_name)
+            )
+        )
+        for instance in instances
+    ]
+
+    required = {}  # permission -> [instance index]
+    for index, transitions in enumerate(available):
+        for transition in transitions:
+            if transition.permission and not callable(transition.permission):
+                required.setdefault(transition.permission, []).append(index)
+
+    allowed = {}  # permission -> set(instance index)
+    for permission, indexes in required.items():
+        if user.has_perm(permission):
+            allowed[permission] = set(indexes)
+        else:
+            objs = [instances[index] for index in indexes]
+            allowed[permission] = set(
+                index
+                for index, granted in zip(
+                    indexes, _bulk_user_has_perm(user, permission, objs)
+                )
+                if granted
+            )
+
+    result = []
+    for index, transitions in enumerate(available):
+        result.append(
+            [
+                transition
+                for transition in transitions
+                if not transition.permission
+                or (
+                    transition.has_perm(instances[index], user)
+                    if callable(transition.permission)
+                    else index in allowed[transition.permission]
+                )
+            ]
+        )
+    return result
+
+
 class FSMMeta(object):
     """
     Models methods transitions meta information
@@ -195,6 +391,7 @@ class FSMMeta(object):
     def __init__(self, field, method):
         self.field = field
         self.transitions = {}  # source -> Transition
+        self.lock = None  # None, True, "nowait" or "skip_locked"
 
     def get_transition(self, source):
         transition = self.transitions.get(source, None)
@@ -227,6 +424,42 @@ class FSMMeta(object):
             custom=custom,
         )
 
+    def get_state_filters(self, field_name):
+        """
+        Returns [(Q, Transition)] selecting rows in the states each transition
+        of the method starts from, in the same precedence as `get_transition`
+        """
+        filters, explicit = [], []
+        for source, transition in self.transitions.items():
+            if source not in ("*", "+"):
+                explicit.append(source)
+                filters.append((Q(**{field_name: source}), transition))
+
+        not_explicit = ~Q(**{"{0}__in".format(field_name): explicit})
+        if "*" in self.transitions:
+            filters.append((not_explicit, self.transitions["*"]))
+        elif "+" in self.transitions:
+            transition = self.transitions["+"]
+            filters.append(
+                (not_explicit & ~Q(**{field_name: transition.target}), transition)
+            )
+
+        return filters
+
+    def get_allowed_transition(self, state):
+        """
+        Transition from the state, or None if there is no transition from it.
+        Same as has_transition and get_transition in one lookup.
+        """
+        transition = self.transitions.get(state)
+        if transition is None:
+            transition = self.transitions.get("*")
+        if transition is None:
+            transition = self.transitions.get("+")
+            if transition is not None and transition.target == state:
+                return None
+        return transition
+
     def has_transition(self, state):
         """
         Lookup if any transition exists from current model state using current method
@@ -242,7 +475,7 @@ class FSMMeta(object):
 
         return False
 
-    def conditions_met(self, instance, state):
+    def conditions_met(self, instance, state, cache=None):
         """
         Check if all conditions have been met
         """
@@ -250,12 +483,7 @@ class FSMMeta(object):
 
         if transition is None:
             return False
-        elif transition.conditions is None:
-            return True
-        else:
-            return all(
-                map(lambda condition: condition(instance), transition.conditions)
-            )
+        return transition.conditions_met(instance, cache)
 
     def has_transition_perm(self, instance, state, user):
         transition = self.get_transition(state)
@@ -307,8 +535,12 @@ class FSMFieldMixin(object):
 
     def __init__(self, *args, **kwargs):
         self.protected = kwargs.pop("protected", False)
+        self.count_states = kwargs.pop("count_states", False)
         self.transitions = {}  # cls -> (transitions name -> method)
+        self.transitions_index = {}  # cls -> (state -> [Transition], [wildcard Transition])
         self.state_proxy = {}  # state -> ProxyClsRef
+        self.state_proxy_models = {}  # (cls, state) -> resolved proxy cls
+        self.state_graphs = {}  # cls -> StateGraph
 
         state_choices = kwargs.pop("state_choices", None)
         choices = kwargs.get("choices", None)
@@ -324,13 +556,50 @@ class FSMFieldMixin(object):
 
         super(FSMFieldMixin, self).__init__(*args, **kwargs)
 
+    def check(self, **kwargs):
+        from django.core import checks
+
+        errors = super(FSMFieldMixin, self).check(**kwargs)
+        if self.count_states and not django_apps.is_installed(COUNTERS_APP):
+            errors.append(
+                checks.Error(
+                    "count_states=True requires '{0}' in INSTALLED_APPS.".format(COUNTERS_APP),
+                    obj=self,
+                    id="django_fsm.E001",
+                )
+            )
+        elif self.count_states and hasattr(self, "model"):
+            from django_fsm.counters.models import StateCountersMixin
+
+            if not issubclass(self.model, StateCountersMixin):
+                errors.append(
+                    checks.Error(
+                        "count_states=True requires {0} to inherit from StateCountersMixin.".format(
+                            self.model._meta.label
+                        ),
+                        obj=self,
+                        id="django_fsm.E002",
+                    )
+                )
+        return errors
+
     def deconstruct(self):
         name, path, args, kwargs = super(FSMFieldMixin, self).deconstruct()
         if self.protected:
             kwargs["protected"] = self.protected
+        if self.count_states:
+            kwargs["count_states"] = self.count_states
         return name, path, args, kwargs
 
     def get_state(self, instance):
+        try:
+            return instance.__dict__[self.name]
+        except KeyError:
+            if self.deferred_attribute is None:
+                raise
+            return self.deferred_attribute.__get__(instance)
+
+    def _get_deferred_attribute(self):
         # The state field may be deferred. We delegate the logic of figuring
         # this out and loading the deferred field on-demand to Django's
         # built-in DeferredAttribute class. DeferredAttribute's instantiation
@@ -340,101 +609,185 @@ class FSMFieldMixin(object):
         # django_fsm, but this comes with the added responsibility of keeping
         # the copied code up to date.
         if django.VERSION[:3] >= (3, 0, 0):
-            return DeferredAttribute(self).__get__(instance)
+            return DeferredAttribute(self)
         elif django.VERSION[:3] >= (2, 1, 0):
-            return DeferredAttribute(self.name).__get__(instance)
+            return DeferredAttribute(self.name)
         elif django.VERSION[:3] >= (1, 10, 0):
-            return DeferredAttribute(self.name, model=None).__get__(instance)
+            return DeferredAttribute(self.name, model=None)
         else:
-            # The field was either not deferred (in which case we can return it
-            # right away) or ir was, but we are running on an unknown version
-            # of Django and we do not know the appropriate DeferredAttribute
-            # interface, and accessing the field will raise KeyError.
-            return instance.__dict__[self.name]
+            # We are running on an unknown version of Django and we do not
+            # know the appropriate DeferredAttribute interface, and accessing
+            # the deferred field will raise KeyError.
+            return None
 
     def set_state(self, instance, state):
         instance.__dict__[self.name] = state
 
-    def set_proxy(self, instance, state):
+    def get_proxy_model(self, instance_cls, state):
         """
-        Change class
+        Returns proxy class for the state, or None if the state has no proxy
         """
-        if state in self.state_proxy:
+        if state not in self.state_proxy:
+            return None
+
+        model = self.state_proxy_models.get((instance_cls, state))
+        if model is None:
             state_proxy = self.state_proxy[state]
 
             try:
                 app_label, model_name = state_proxy.split(".")
             except ValueError:
                 # If we can't split, assume a model in current app
-                app_label = instance._meta.app_label
+                app_label = instance_cls._meta.app_label
                 model_name = state_proxy
 
             model = get_model(app_label, model_name)
             if model is None:
                 raise ValueError("No model found {0}".format(state_proxy))
 
+            self.state_proxy_models[(instance_cls, state)] = model
+        return model
+
+    def set_proxy(self, instance, state):
+        """
+        Change class
+        """
+        model = self.get_proxy_model(instance.__class__, state)
+        if model is not None and instance.__class__ is not model:
             instance.__class__ = model
 
+    def lock_state(self, instance, lock):
+        """
+        Re-read the state from the row locked with SELECT ... FOR UPDATE.
+        Should be called within an atomic block.
+        """
+        if instance.pk is None or instance._state.adding:
+            return
+
+        queryset = instance.__class__._base_manager.using(instance._state.db).filter(
+            pk=instance.pk
+        )
+        states = list(
+            queryset.select_for_update(
+                nowait=lock == "nowait", skip_locked=lock == "skip_locked"
+            ).values_list(self.attname, flat=True)
+        )
+        if not states:
+            raise ConcurrentTransition(
+                "Cannot lock object! The row is locked or has been deleted!",
+                object=instance,
+            )
+
+        self.set_proxy(instance, states[0])
+        self.set_state(instance, states[0])
+        if isinstance(instance, ConcurrentTransitionMixin):
+            instance._update_initial_state(attnames=[self.attname])
+
     def change_state(self, instance, method, *args, **kwargs):
+        current_state, transition = self._get_allowed_transition(instance, method)
+        sender = instance.__class__
+
+        # signal kwargs are built only if somebody listens
+        if _has_listeners(pre_transition, sender):
+            pre_transition.send(
+                **self._get_signal_kwargs(
+                    instance, method, current_state, transition.target, args, kwargs
+                )
+            )
+
+        try:
+            result = method(instance, *args, **kwargs)
+            next_state = self._set_target_state(
+                instance, transition, result, args, kwargs
+            )
+        except Exception as exc:
+            exception_state = transition.on_error
+            if exception_state:
+                self._set_exception_state(instance, exception_state)
+                if _has_listeners(post_transition, sender):
+                    signal_kwargs = self._get_signal_kwargs(
+                        instance, method, current_state, exception_state, args, kwargs
+                    )
+                    signal_kwargs["exception"] = exc
+                    post_transition.send(**signal_kwargs)
+            raise
+        else:
+            if _has_listeners(post_transition, sender):
+                post_transition.send(
+                    **self._get_signal_kwargs(
+                        instance, method, current_state, next_state, args, kwargs
+                    )
+                )
+
+        return result
+
+    def _get_allowed_transition(self, instance, method):
+        """
+        Locks the instance state if the transition requires, and returns
+        (current state, transition allowed from it), checking conditions
+        """
         meta = method._django_fsm
-        method_name = method.__name__
+        if meta.lock:
+            self.lock_state(instance, meta.lock)
         current_state = self.get_state(instance)
 
-        if not meta.has_transition(current_state):
+        transition = meta.get_allowed_transition(current_state)
+        if transition is None:
             raise TransitionNotAllowed(
                 "Can't switch from state '{0}' using method '{1}'".format(
-                    current_state, method_name
+                    current_state, method.__name__
                 ),
                 object=instance,
                 method=method,
             )
-        if not meta.conditions_met(instance, current_state):
+        if not transition.conditions_met(instance):
             raise TransitionNotAllowed(
                 "Transition conditions have not been met for method '{0}'".format(
-                    method_name
+                    method.__name__
                 ),
                 object=instance,
                 method=method,
             )
+        return current_state, transition
 
-        next_state = meta.next_state(current_state)
+    def _set_target_state(self, instance, transition, result, args, kwargs):
+        """
+        Switches the instance to the transition target, resolving dynamic
+        targets with the method result. Returns the new state
+        """
+        next_state = transition.target
+        if next_state is not None:
+            if hasattr(next_state, "get_state"):
+                next_state = next_state.get_state(
+                    instance, transition, result, args=args, kwargs=kwargs
+                )
+            self.set_proxy(instance, next_state)
+            self.set_state(instance, next_state)
+        return next_state
 
-        signal_kwargs = {
+    def _set_exception_state(self, instance, exception_state):
+        self.set_proxy(instance, exception_state)
+        self.set_state(instance, exception_state)
+
+    def _get_signal_kwargs(self, instance, method, source, target, args, kwargs):
+        return {
             "sender": instance.__class__,
             "instance": instance,
-            "name": method_name,
-            "field": meta.field,
-            "source": current_state,
-            "target": next_state,
+            "name": method.__name__,
+            "field": method._django_fsm.field,
+            "source": source,
+            "target": target,
             "method_args": args,
             "method_kwargs": kwargs,
         }
 
-        pre_transition.send(**signal_kwargs)
-
-        try:
-            result = method(instance, *args, **kwargs)
-            if next_state is not None:
-                if hasattr(next_state, "get_state"):
-                    next_state = next_state.get_state(
-                        instance, transition, result, args=args, kwargs=kwargs
-                    )
-                    signal_kwargs["target"] = next_state
-                self.set_proxy(instance, next_state)
-                self.set_state(instance, next_state)
-        except Exception as exc:
-            exception_state = meta.exception_state(current_state)
-            if exception_state:
-                self.set_proxy(instance, exception_state)
-                self.set_state(instance, exception_state)
-                signal_kwargs["target"] = exception_state
-                signal_kwargs["exception"] = exc
-                post_transition.send(**signal_kwargs)
-            raise
-        else:
-            post_transition.send(**signal_kwargs)
+    def achange_state(self, instance, method, *args, **kwargs):
+        """
+        Awaitable change_state for `async def` transition methods
+        """
+        from django_fsm.aio import achange_state
 
-        return result
+        return achange_state(self, instance, method, *args, **kwargs)
 
     def get_all_transitions(self, instance_cls):
         """
@@ -448,10 +801,56 @@ class FSMFieldMixin(object):
             for transition in meta.transitions.values():
                 yield transition
 
+    def graph(self, instance_cls):
+        """
+        Returns StateGraph of the field transitions, built once per model class
+        """
+        graph = self.state_graphs.get(instance_cls)
+        if graph is None:
+            graph = self.state_graphs[instance_cls] = StateGraph(self, instance_cls)
+        return graph
+
+    def get_state_transitions(self, instance_cls, state):
+        """
+        Returns [Transition] available from the state, ignoring conditions
+        """
+        index, wildcards = self.transitions_index[instance_cls]
+        return index.get(state, wildcards)
+
+    def _build_transitions_index(self, sender_transitions):
+        """
+        Expand `*` and `+` sources into a per-state ordered list of transitions.
+
+        Every state explicitly used as a source, or as a `+` target, gets its
+        own entry. Any other state can only be left through wildcard transitions.
+        """
+        metas = [method._django_fsm for method in sender_transitions.values()]
+
+        index = {}
+        for meta in metas:
+            for source, transition in meta.transitions.items():
+                state = transition.target if source == "+" else source
+                if state in ("*", "+") or state in index:
+                    continue
+                index[state] = [
+                    state_meta.get_transition(state)
+                    for state_meta in metas
+                    if state_meta.has_transition(state)
+                ]
+
+        wildcards = []
+        for meta in metas:
+            transition = meta.transitions.get("*", meta.transitions.get("+"))
+            if transition is not None:
+                wildcards.append(transition)
+
+        return index, wildcards
+
     def contribute_to_class(self, cls, name, **kwargs):
         self.base_cls = cls
 
         super(FSMFieldMixin, self).contribute_to_class(cls, name, **kwargs)
+        self.deferred_attribute = self._get_deferred_attribute()
         setattr(cls, self.name, self.descriptor_class(self))
         setattr(
             cls,
@@ -469,7 +868,7 @@ class FSMFieldMixin(object):
             partialmethod(get_available_user_FIELD_transitions, field=self),
         )
 
-        class_prepared.connect(self._collect_transitions)
+        fsm_fields.setdefault(cls, []).append(self)
 
     def _collect_transitions(self, *args, **kwargs):
         sender = kwargs["sender"]
@@ -492,13 +891,42 @@ class FSMFieldMixin(object):
                 )
             )
 
+        # Same as inspect.getmembers, but without getattr on every class attribute
+        transitions, seen = [], set()
+        for cls in sender.__mro__:
+            for method_name, method in cls.__dict__.items():
+                if method_name in seen:
+                    continue
+                seen.add(method_name)
+                if is_field_transition_method(method):
+                    transitions.append((method_name, method))
+
         sender_transitions = {}
-        transitions = inspect.getmembers(sender, predicate=is_field_transition_method)
-        for method_name, method in transitions:
+        for method_name, method in sorted(transitions, key=lambda item: item[0]):
             method._django_fsm.field = self
             sender_transitions[method_name] = method
 
         self.transitions[sender] = sender_transitions
+        self.transitions_index[sender] = self._build_transitions_index(
+            sender_transitions
+        )
+
+
+# model cls -> [FSMFieldMixin] declared on it
+fsm_fields = {}
+
+
+def collect_transitions(sender, **kwargs):
+    """
+    Collect transitions of each model class inheriting FSM fields.
+    Base classes fields go first, same as their declaration order.
+    """
+    for cls in reversed(sender.__mro__):
+        for field in fsm_fields.get(cls, ()):
+            field._collect_transitions(sender=sender)
+
+
+class_prepared.connect(collect_transitions)
 
 
 class FSMField(FSMFieldMixin, models.CharField):
@@ -531,11 +959,52 @@ class FSMKeyField(FSMFieldMixin, models.ForeignKey):
         instance.__dict__[self.attname] = self.to_python(state)
 
 
+_state_proxy_fields = {}  # model class -> [(field with state_choices, row position)]
+
+
 class FSMModelMixin(object):
     """
-    Mixin that allows refresh_from_db for models with fsm protected fields
+    Mixin that allows refresh_from_db for models with fsm protected fields,
+    and loads rows of fields with state_choices directly as the state proxy class
     """
 
+    @classmethod
+    def _get_state_proxy_fields(cls):
+        """
+        Returns [(field, position)] of fields with state_choices, the
+        position is the field index in the fully loaded row values
+        """
+        try:
+            return _state_proxy_fields[cls]
+        except KeyError:
+            fields = _state_proxy_fields[cls] = [
+                (field, position)
+                for position, field in enumerate(cls._meta.concrete_fields)
+                if isinstance(field, FSMFieldMixin) and field.state_proxy
+            ]
+            return fields
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        proxy_fields = cls._get_state_proxy_fields()
+        if not proxy_fields:
+            return super(FSMModelMixin, cls).from_db(db, field_names, values)
+
+        loaded = len(values) == len(cls._meta.concrete_fields)
+        for field, position in proxy_fields:
+            if loaded:
+                state = values[position]
+            else:
+                try:
+                    state = values[field_names.index(field.attname)]
+                except ValueError:
+                    # deferred field
+                    continue
+            model = field.get_proxy_model(cls, state)
+            if model is not None and model is not cls:
+                return model.from_db(db, field_names, values)
+        return super(FSMModelMixin, cls).from_db(db, field_names, values)
+
     def _get_protected_fsm_fields(self):
         def is_fsm_and_protected(f):
             return isinstance(f, FSMFieldMixin) and f.protected
@@ -625,17 +1094,30 @@ class ConcurrentTransitionMixin(object):
         # INSERT if UPDATE fails.
         # Thus, we need to make sure we only catch the case when the object *is* in the DB, but with changed state; and
         # mimic standard _do_update behavior otherwise. Django will pick it up and execute _do_insert.
-        if not updated and base_qs.filter(pk=pk_val).using(using).exists():
+        # A single query for the current state values tells both cases apart and lets the caller see the actual state
+        # without reloading the object. Without a state filter only a missing PK can lead here.
+        if updated or not state_filter:
+            return updated
+
+        current_states = (
+            base_qs.filter(pk=pk_val).using(using).values(*state_filter.keys()).first()
+        )
+        if current_states is not None:
             raise ConcurrentTransition(
-                "Cannot save object! The state has been changed since fetched from the database!"
+                "Cannot save object! The state has been changed since fetched from the database!",
+                object=self,
+                current_states=current_states,
             )
 
         return updated
 
-    def _update_initial_state(self):
-        self.__initial_states = dict(
+    def _update_initial_state(self, attnames=None):
+        if attnames is None:
+            self.__initial_states = {}
+        self.__initial_states.update(
             (field.attname, field.value_from_object(self))
             for field in self.state_fields
+            if attnames is None or field.attname in attnames
         )
 
     def refresh_from_db(self, *args, **kwargs):
@@ -647,6 +1129,328 @@ class ConcurrentTransitionMixin(object):
         self._update_initial_state()
 
 
+class TransitionNames(TextField):
+    """
+    Output field for comma separated transition names computed in the database
+    """
+
+    def from_db_value(self, value, *args):
+        if not value:
+            return []
+        return [name for name in value.split(",") if name]
+
+
+COUNTERS_APP = "django_fsm.counters"
+
+
+def _get_state_counter_model():
+    if not django_apps.is_installed(COUNTERS_APP):
+        raise ImproperlyConfigured(
+            "count_states=True requires '{0}' in INSTALLED_APPS".format(COUNTERS_APP)
+        )
+    from django_fsm.counters.models import StateCounter
+
+    return StateCounter
+
+
+class FSMQuerySet(models.QuerySet):
+    """
+    QuerySet with bulk transitions support.
+
+    Use as `objects = FSMQuerySet.as_manager()`
+    """
+
+    # Chunk size used when affected primary keys have to be collected
+    # but no explicit `chunk_size` was given, keeps `pk__in` lists within
+    # database query parameter limits
+    pks_chunk_size = 500
+
+    def _get_transition_meta(self, name):
+        method = getattr(self.model, name, None)
+        if not hasattr(method, "_django_fsm"):
+            raise TypeError("%s method is not transition" % name)
+        return method._django_fsm
+
+    def _chunks(self, queryset, chunk_size, with_pks=False):
+        """
+        Yields (pks, queryset) pairs. pks is None if there is only one
+        chunk and `with_pks` was not requested, otherwise chunks are
+        limited to `pks_chunk_size` rows by default
+        """
+        if chunk_size is None:
+            if not with_pks:
+                yield None, queryset
+                return
+            chunk_size = self.pks_chunk_size
+
+        queryset, last_pk = queryset.order_by("pk"), None
+        while True:
+            chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            pks = list(chunk.values_list("pk", flat=True)[:chunk_size])
+            if not pks:
+                return
+            last_pk = pks[-1]
+            yield pks, queryset.filter(pk__in=pks)
+
+    def _has_bulk_listeners(self):
+        return _has_listeners(pre_bulk_transition, self.model) or _has_listeners(
+            post_bulk_transition, self.model
+        )
+
+    def _get_transition_filters(self, name, check_conditions=True):
+        """
+        Returns (meta, [(Q, Transition)]) with transition conditions
+        included into Q if `check_conditions` set
+        """
+        meta = self._get_transition_meta(name)
+        filters = []
+        for q, transition in meta.get_state_filters(meta.field.attname):
+            if check_conditions:
+                conditions_q = transition.get_conditions_q()
+                if conditions_q is None:
+                    raise ValueError(
+                        "Transition '{0}' has conditions that can't be checked in the database".format(name)
+                    )
+                q &= conditions_q
+            filters.append((q, transition))
+        return meta, filters
+
+    def _can_proceed_q(self, name, check_conditions):
+        _, filters = self._get_transition_filters(name, check_conditions)
+        return reduce(operator.or_, [q for q, _ in filters])
+
+    def filter_can_proceed(self, name, check_conditions=True):
+        """
+        Rows in one of the `name` transition source states, with the
+        transition conditions met.
+
+        Raises ValueError if a condition has no Q equivalent, set
+        ``check_conditions`` argument to ``False`` to skip checking
+        conditions.
+        """
+        return self.filter(self._can_proceed_q(name, check_conditions))
+
+    def exclude_can_proceed(self, name, check_conditions=True):
+        """
+        Rows the `name` transition can't proceed from
+        """
+        return self.exclude(self._can_proceed_q(name, check_conditions))
+
+    def annotate_available_transitions(self, field_name, alias=None):
+        """
+        Annotate each row with the list of transition names available from
+        its state, as `available_<field_name>_transitions` unless alias set.
+
+        Transitions with conditions are included only if all of the
+        conditions have Q equivalent.
+        """
+        field = self.model._meta.get_field(field_name)
+        index, wildcards = field.transitions_index[self.model]
+
+        def names(transitions):
+            return ",".join(
+                transition.name for transition in transitions if not transition.conditions
+            )
+
+        states = {}  # names -> [state]
+        for state, transitions in index.items():
+            if not isinstance(state, State):
+                states.setdefault(names(transitions), []).append(state)
+
+        # transitions with conditions are checked one by one
+        conditional = []
+        for method in field.transitions[self.model].values():
+            whens = []
+            for q, transition in method._django_fsm.get_state_filters(field.attname):
+                conditions_q = transition.get_conditions_q()
+                if transition.conditions and conditions_q is not None:
+                    whens.append(
+                        When(q & conditions_q, then=Value("," + transition.name))
+                    )
+            if whens:
+                conditional.append(
+                    Case(*whens, default=Value(""), output_field=TextField())
+                )
+
+        expression = Case(
+            *[
+                When(
+                    Q(**{"{0}__in".format(field.attname): state_list}),
+                    then=Value(state_names),
+                )
+                for state_names, state_list in states.items()
+            ],
+            default=Value(names(wildcards)),
+            output_field=TextField() if conditional else TransitionNames()
+        )
+        if conditional:
+            expression = Concat(expression, *conditional, output_field=TransitionNames())
+
+        alias = alias or "available_{0}_transitions".format(field_name)
+        return self.annotate(**{alias: expression})
+
+    def state_counts(self, field=None):
+        """
+        Returns {state: number of rows}. `field` is the FSM field name,
+        required for models with several FSM fields.
+
+        For a field declared with count_states=True and an unfiltered
+        queryset the maintained counters are read instead of grouping the table.
+        """
+        field = _get_fsm_field(self.model, field)
+        if field.count_states and not self.query.where:
+            StateCounter = _get_state_counter_model()
+            return StateCounter.objects.get_counts(self.model, field, using=self.db)
+
+        counts = (
+            self.order_by()
+            .values_list(field.attname)
+            .annotate(rows=Count("pk"))
+        )
+        return dict((state, count) for state, count in counts if count)
+
+    def fsm_transition(self, name, chunk_size=None, per_instance=False, skip_method=False):
+        """
+        Run the `name` transition for all rows in the queryset that are in
+        one of the transition source states. Returns the number of rows moved.
+
+        With `per_instance=True` each row in the source states is loaded,
+        checked against conditions, transitioned through the model method
+        and saved, `chunk_size` rows at a time. Async transition methods
+        are rejected with ValueError.
+
+        With `skip_method=True` rows are moved with a single guarded UPDATE
+        per chunk instead; the transition method body is not called and
+        only the pre_bulk_transition/post_bulk_transition signals are sent,
+        once per chunk. Transitions with dynamic targets or conditions
+        without Q equivalent can't be expressed that way and raise ValueError.
+
+        One of the two has to be chosen explicitly, otherwise ValueError
+        is raised.
+        """
+        meta, filters = self._get_transition_filters(
+            name, check_conditions=not per_instance
+        )
+        field = meta.field
+        queryset = self.filter(reduce(operator.or_, [q for q, _ in filters]))
+        signal_kwargs = {
+            "sender": self.model,
+            "name": name,
+            "field": field,
+            "transitions": dict(
+                (transition.source, transition.target) for _, transition in filters
+            ),
+        }
+
+        if per_instance:
+            return self._fsm_transition_per_instance(
+                queryset, name, chunk_size, signal_kwargs
+            )
+
+        if not skip_method:
+            raise ValueError(
+                "Bulk transition '{0}' requires per_instance=True to run the transition method, "
+                "or skip_method=True to update the rows without calling it".format(name)
+            )
+
+        for _, transition in filters:
+            if transition.target is None or isinstance(transition.target, State):
+                raise ValueError(
+                    "Transition '{0}' has no static target state and can't be executed in bulk".format(name)
+                )
+
+        targets = set(transition.target for _, transition in filters)
+        if len(targets) == 1:
+            next_state = targets.pop()
+        else:
+            # rows are already filtered by conditions, UPDATE can't join
+            # related tables, so pick the target by state only
+            next_state = Case(
+                *[
+                    When(q, then=Value(transition.target))
+                    for q, transition in meta.get_state_filters(field.attname)
+                ]
+            )
+
+        updated = 0
+        send_signals = self._has_bulk_listeners()
+        for pks, chunk in self._chunks(
+            queryset, chunk_size, with_pks=send_signals or field.count_states
+        ):
+            if send_signals:
+                signal_kwargs.update({"pks": pks, "instances": None})
+                pre_bulk_transition.send(**signal_kwargs)
+            if field.count_states:
+                updated += self._counted_update(chunk, meta, next_state)
+            else:
+                updated += chunk.update(**{field.attname: next_state})
+            if send_signals:
+                post_bulk_transition.send(**signal_kwargs)
+        return updated
+
+    def _counted_update(self, chunk, meta, next_state):
+        """
+        Locks the chunk rows to count them per source state, then updates
+        them and the state counters in one transaction
+        """
+        StateCounter = _get_state_counter_model()
+
+        field = meta.field
+        with transaction.atomic(using=self.db):
+            rows = list(chunk.select_for_update().values_list("pk", field.attname))
+            if not rows:
+                return 0
+            updated = chunk.filter(pk__in=[pk for pk, _ in rows]).update(
+                **{field.attname: next_state}
+            )
+            deltas = Counter()
+            for _, state in rows:
+                deltas[state] -= 1
+                deltas[meta.get_allowed_transition(state).target] += 1
+            StateCounter.objects.add(self.model, field, deltas, using=self.db)
+        return updated
+
+    def _fsm_transition_per_instance(self, queryset, name, chunk_size, signal_kwargs):
+        if iscoroutinefunction(getattr(self.model, name)):
+            raise ValueError(
+                "Transition '{0}' is async and can't be run per instance, "
+                "use skip_method=True to update the rows without calling it".format(name)
+            )
+        updated = 0
+        send_signals = self._has_bulk_listeners()
+        for _, chunk in self._chunks(queryset, chunk_size):
+            # a failing row rolls back the whole chunk, so no rows are left
+            # moved without post_bulk_transition, and locking transitions
+            # run within a transaction
+            with transaction.atomic(using=self.db):
+                updated += self._fsm_transition_chunk(chunk, name, send_signals, signal_kwargs)
+        return updated
+
+    def _fsm_transition_chunk(self, chunk, name, send_signals, signal_kwargs):
+        instances = [
+            instance for instance in chunk if can_proceed(getattr(instance, name))
+        ]
+        if not instances:
+            return 0
+
+        if send_signals:
+            signal_kwargs.update(
+                {
+                    "pks": [instance.pk for instance in instances],
+                    "instances": instances,
+                }
+            )
+            pre_bulk_transition.send(**signal_kwargs)
+
+        for instance in instances:
+            getattr(instance, name)()
+            instance.save()
+
+        if send_signals:
+            post_bulk_transition.send(**signal_kwargs)
+        return len(instances)
+
+
 def transition(
     field,
     source="*",
@@ -655,13 +1459,21 @@ def transition(
     conditions=[],
     permission=None,
     custom={},
+    lock=None,
 ):
     """
     Method decorator to mark allowed transitions.
 
     Set target to None if current state needs to be validated and
     has not changed after the function call.
+
+    Set lock to True, "nowait" or "skip_locked" to re-read the state
+    with SELECT ... FOR UPDATE before the transition is checked.
+
+    `async def` methods are wrapped into awaitable transitions.
     """
+    if lock not in (None, False, True, "nowait", "skip_locked"):
+        raise ValueError("Unknown lock mode {0}".format(lock))
 
     def inner_transition(func):
         wrapper_installed, fsm_meta = True, getattr(func, "_django_fsm", None)
@@ -670,6 +1482,12 @@ def transition(
             fsm_meta = FSMMeta(field=field, method=func)
             setattr(func, "_django_fsm", fsm_meta)
 
+        is_async = iscoroutinefunction(func)
+        if lock:
+            if is_async:
+                raise ValueError("lock is not supported for async transitions")
+            fsm_meta.lock = lock
+
         if isinstance(source, (list, tuple, set)):
             for state in source:
                 func._django_fsm.add_transition(
@@ -680,14 +1498,19 @@ def transition(
                 func, source, target, on_error, conditions, permission, custom
             )
 
+        if wrapper_installed:
+            return func
+
+        if is_async:
+            from django_fsm.aio import async_transition_wrapper
+
+            return async_transition_wrapper(fsm_meta, func)
+
         @wraps(func)
         def _change_state(instance, *args, **kwargs):
             return fsm_meta.field.change_state(instance, func, *args, **kwargs)
 
-        if not wrapper_installed:
-            return _change_state
-
-        return func
+        return _change_state
 
     return inner_transition
 
@@ -708,7 +1531,8 @@ def can_proceed(bound_method, check_conditions=True):
     current_state = meta.field.get_state(im_self)
 
     return meta.has_transition(current_state) and (
-        not check_conditions or meta.conditions_met(im_self, current_state)
+        not check_conditions
+        or meta.conditions_met(im_self, current_state, get_condition_cache())
     )
 
 
@@ -726,11 +1550,179 @@ def has_transition_perm(bound_method, user):
 
     return (
         meta.has_transition(current_state)
-        and meta.conditions_met(im_self, current_state)
+        and meta.conditions_met(im_self, current_state, get_condition_cache())
         and meta.has_transition_perm(im_self, current_state, user)
     )
 
 
+# (app_label, model_name, transition name) -> count, updated by run_transition
+transition_attempts = Counter()
+transition_conflicts = Counter()
+
+
+def _refresh_state_fields(instance):
+    attnames = [
+        field.attname
+        for field in instance._meta.concrete_fields
+        if isinstance(field, FSMFieldMixin)
+    ]
+    # protected fields could be reloaded only if not set yet
+    for attname in attnames:
+        instance.__dict__.pop(attname, None)
+    instance.refresh_from_db(fields=attnames)
+
+
+def run_transition(
+    instance, name, retries=3, backoff=0.05, method_args=(), method_kwargs=None
+):
+    """
+    Run the `name` transition and save the instance within an atomic block,
+    retrying on ConcurrentTransition.
+
+    On conflict, only the state fields are reloaded from the database. If the
+    instance is already in the transition target state, it is considered
+    done and None is returned. Otherwise the transition is retried after
+    a random delay of up to `backoff * 2 ** attempt` seconds.
+
+    Attempts and conflicts are counted per transition in
+    `transition_attempts` and `transition_conflicts`.
+
+    Async transitions are rejected with ValueError.
+    """
+    method = getattr(instance, name)
+    if not hasattr(method, "_django_fsm"):
+        raise TypeError("%s method is not transition" % name)
+
+    if iscoroutinefunction(method):
+        raise ValueError("%s transition is async, await it and save the instance instead" % name)
+
+    meta = method._django_fsm
+    opts = instance._meta
+    key = (opts.app_label, opts.model_name, name)
+
+    for attempt in range(retries + 1):
+        transition_attempts[key] += 1
+        source = meta.field.get_state(instance)
+        try:
+            with transaction.atomic(using=instance._state.db):
+                result = method(*method_args, **(method_kwargs or {}))
+                instance.save()
+            return result
+        except ConcurrentTransition:
+            transition_conflicts[key] += 1
+            if attempt == retries:
+                raise
+
+        _refresh_state_fields(instance)
+
+        transition = meta.get_transition(source)
+        target = transition.target if transition is not None else None
+        if target is not None and not isinstance(target, State):
+            if meta.field.get_state(instance) == target:
+                return None
+
+        # if the transition is not allowed anymore, retry at once to raise TransitionNotAllowed
+        if backoff and can_proceed(method):
+            time.sleep(random.uniform(0, backoff * 2**attempt))
+
+
+# (model, field name, source, target) -> (Transition, ...) or None, filled by plan_transitions
+transition_plans = {}
+
+
+def _get_fsm_field(instance_cls, field_name=None):
+    fields = [
+        field
+        for field in instance_cls._meta.fields
+        if isinstance(field, FSMFieldMixin)
+        and (field_name is None or field.name == field_name)
+    ]
+    if field_name is not None and not fields:
+        raise ValueError(
+            "{0} has no FSM field '{1}'".format(instance_cls.__name__, field_name)
+        )
+    if len(fields) != 1:
+        raise ValueError(
+            "{0} has {1} FSM fields, specify the field name".format(
+                instance_cls.__name__, len(fields)
+            )
+        )
+    return fields[0]
+
+
+def _find_transitions_path(field, instance_cls, source, target, allowed=None):
+    """
+    Breadth-first search over the field transitions index, returns
+    [Transition] or None. Transitions with dynamic or no target are skipped
+    """
+    if source == target:
+        return []
+
+    parents = {source: None}
+    queue = deque([source])
+    while queue:
+        state = queue.popleft()
+        for transition in field.get_state_transitions(instance_cls, state):
+            next_state = transition.target
+            if next_state is None or isinstance(next_state, State) or next_state in parents:
+                continue
+            if allowed is not None and not allowed(transition):
+                continue
+            parents[next_state] = (state, transition)
+            if next_state == target:
+                path = []
+                while parents[next_state] is not None:
+                    next_state, transition = parents[next_state]
+                    path.append(transition)
+                path.reverse()
+                return path
+            queue.append(next_state)
+    return None
+
+
+def plan_transitions(instance, target_state, user=None, field=None, check_conditions=False):
+    """
+    Returns the shortest list of Transition leading the instance from its
+    current state to the `target_state`, [] if it is already there, or None
+    if the state can't be reached. `field` is the FSM field name, required
+    for models with several FSM fields.
+
+    Transitions with GET_STATE or RETURN_VALUE targets are not followed.
+    Plans ignoring conditions and permissions are memoised per model, field,
+    source and target states of the machine only, so arbitrary targets
+    don't grow the cache. With `check_conditions` or a `user`, transitions
+    with unmet conditions or without user permission are skipped, both
+    checked against the instance as it is now.
+    """
+    instance_cls = instance.__class__
+    field = _get_fsm_field(instance_cls, field)
+    source = field.get_state(instance)
+
+    states = field.graph(instance_cls).states
+    if target_state != source and target_state not in states:
+        return None
+
+    if user is None and not check_conditions and source in states:
+        key = (instance_cls, field.name, source, target_state)
+        try:
+            path = transition_plans[key]
+        except KeyError:
+            path = _find_transitions_path(field, instance_cls, source, target_state)
+            path = transition_plans[key] = tuple(path) if path is not None else None
+        return list(path) if path is not None else None
+
+    cache = get_condition_cache()
+    if cache is None:
+        cache = {}
+
+    def allowed(transition):
+        if check_conditions and not transition.conditions_met(instance, cache):
+            return False
+        return user is None or transition.has_perm(instance, user)
+
+    return _find_transitions_path(field, instance_cls, source, target_state, allowed)
+
+
 class State(object):
     def get_state(self, model, transition, result, args=[], kwargs={}):
         raise NotImplementedError
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Async transitions support
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+
+from django_fsm import _has_listeners
+from django_fsm.signals import pre_transition, post_transition
+
+
+async def send_signal(signal, **kwargs):
+    if hasattr(signal, "asend"):
+        await signal.asend(**kwargs)
+    else:
+        # receivers may use the database, so run them out of the event loop
+        await sync_to_async(signal.send)(**kwargs)
+
+
+async def achange_state(field, instance, method, *args, **kwargs):
+    """
+    FSMFieldMixin.change_state counterpart for `async def` transition methods.
+
+    Conditions are called synchronously, and should not query the database.
+    """
+    current_state, transition = field._get_allowed_transition(instance, method)
+    sender = instance.__class__
+
+    if _has_listeners(pre_transition, sender):
+        await send_signal(
+            pre_transition,
+            **field._get_signal_kwargs(
+                instance, method, current_state, transition.target, args, kwargs
+            )
+        )
+
+    try:
+        result = await method(instance, *args, **kwargs)
+        next_state = field._set_target_state(instance, transition, result, args, kwargs)
+    except Exception as exc:
+        exception_state = transition.on_error
+        if exception_state:
+            field._set_exception_state(instance, exception_state)
+            if _has_listeners(post_transition, sender):
+                signal_kwargs = field._get_signal_kwargs(
+                    instance, method, current_state, exception_state, args, kwargs
+                )
+                signal_kwargs["exception"] = exc
+                await send_signal(post_transition, **signal_kwargs)
+        raise
+    else:
+        if _has_listeners(post_transition, sender):
+            await send_signal(
+                post_transition,
+                **field._get_signal_kwargs(
+                    instance, method, current_state, next_state, args, kwargs
+                )
+            )
+
+    return result
+
+
+def async_transition_wrapper(fsm_meta, func):
+    @wraps(func)
+    async def _change_state(instance, *args, **kwargs):
+        return await fsm_meta.field.achange_state(instance, func, *args, **kwargs)
+
+    return _change_state
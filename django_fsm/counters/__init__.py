@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""
+Optional maintained per-state counters.
+
+Add "django_fsm.counters" to INSTALLED_APPS, declare
+FSMField(count_states=True) and inherit the model from
+django_fsm.counters.models.StateCountersMixin to keep the number of rows
+in each state in the StateCounter model.
+
+Counters move when a row is inserted, saved in another state or deleted,
+in the same transaction, from the state stored in the row. Rows changed with
+QuerySet.update() or raw SQL are not counted, except by
+FSMQuerySet.fsm_transition, use the rebuild_state_counters command
+to recount them.
+"""
+import django
+
+if django.VERSION < (3, 2):
+    default_app_config = "django_fsm.counters.apps.StateCountersConfig"
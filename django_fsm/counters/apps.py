@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from django.apps import AppConfig
+
+
+class StateCountersConfig(AppConfig):
+    name = "django_fsm.counters"
+    label = "fsm_counters"
+    default_auto_field = "django.db.models.AutoField"
+    verbose_name = "State counters"
+
+    def ready(self):
+        from django.apps import apps
+        from django.db.models.signals import class_prepared
+        from django_fsm.counters.models import connect_receivers, on_class_prepared
+
+        for model in apps.get_models():
+            connect_receivers(model)
+        # models declared after the registry is ready, e.g. in tests
+        class_prepared.connect(on_class_prepared, dispatch_uid="django_fsm.counters")
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from django_fsm.counters.models import StateCounter, counted_fields
+
+
+class Command(BaseCommand):
+    help = "Recounts rows per state of FSM fields declared with count_states=True"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            action="store",
+            dest="chunk_size",
+            type=int,
+            default=10000,
+            help="Number of rows counted per query.",
+        )
+        parser.add_argument(
+            "--database",
+            action="store",
+            dest="database",
+            default="default",
+            help="Database to rebuild the counters in.",
+        )
+        parser.add_argument("args", nargs="*", help="[appname[.model]]")
+
+    def get_models(self, args):
+        if not args:
+            return [model for model in apps.get_models()]
+        models = []
+        for arg in args:
+            try:
+                if "." in arg:
+                    models.append(apps.get_model(*arg.split(".", 1)))
+                else:
+                    models.extend(apps.get_app_config(arg).get_models())
+            except LookupError as exc:
+                raise CommandError(str(exc))
+        return models
+
+    def handle(self, *args, **options):
+        for model in self.get_models(args):
+            if model._meta.proxy:
+                continue
+            for field in counted_fields(model):
+                counts = StateCounter.objects.rebuild(
+                    model, field, chunk_size=options["chunk_size"], using=options["database"]
+                )
+                self.stdout.write(
+                    "{0}.{1}: {2} rows in {3} states".format(
+                        model._meta.label, field.name, sum(counts.values()), len(counts)
+                    )
+                )
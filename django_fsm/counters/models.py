@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import Count, F
+from django.db.models.signals import pre_delete
+
+try:
+    from django.utils.encoding import force_text
+except ImportError:  # Django >= 4.0
+    from django.utils.encoding import force_str as force_text
+
+
+def _state_value(state):
+    return force_text(state) if state is not None else None
+
+
+class StateCounterManager(models.Manager):
+    def add(self, model, field, deltas, using=None):
+        """
+        Adds {state: delta} to the counters of the model field.
+
+        Counters are updated in a stable order, so concurrent transactions
+        moving rows between the same states don't deadlock.
+        """
+        content_type = ContentType.objects.db_manager(using).get_for_model(model)
+        deltas = sorted(
+            ((_state_value(state), delta) for state, delta in deltas.items() if delta),
+            key=lambda item: (item[0] is not None, item[0]),
+        )
+        for state, delta in deltas:
+            counters = self.db_manager(using).filter(
+                content_type=content_type, field=field.name, state=state
+            )
+            if counters.update(count=F("count") + delta):
+                continue
+            try:
+                with transaction.atomic(using=using):
+                    self.db_manager(using).create(
+                        content_type=content_type, field=field.name, state=state, count=delta
+                    )
+            except IntegrityError:
+                counters.update(count=F("count") + delta)
+
+    def get_counts(self, model, field, using=None):
+        """
+        Returns {state: count} of the model field, without empty states
+        """
+        content_type = ContentType.objects.db_manager(using).get_for_model(model)
+        counters = (
+            self.db_manager(using)
+            .filter(content_type=content_type, field=field.name)
+            .exclude(count=0)
+            .values_list("state", "count")
+        )
+        return dict(
+            (field.to_python(state) if state is not None else None, count)
+            for state, count in counters
+        )
+
+    def rebuild(self, model, field, chunk_size=10000, using=None):
+        """
+        Recounts the model field states, scanning the table by primary key
+        ranges of `chunk_size` rows, and replaces the stored counters
+        """
+        model = model._meta.concrete_model
+        queryset = model._base_manager.db_manager(using).order_by("pk")
+        counts, last_pk = Counter(), None
+        while True:
+            chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            bounds = list(chunk.values_list("pk", flat=True)[chunk_size - 1:chunk_size])
+            if bounds:
+                chunk = chunk.filter(pk__lte=bounds[0])
+            rows = chunk.order_by().values_list(field.attname).annotate(rows=Count("pk"))
+            for state, count in rows:
+                counts[state] += count
+            if not bounds:
+                break
+            last_pk = bounds[0]
+
+        content_type = ContentType.objects.db_manager(using).get_for_model(model)
+        with transaction.atomic(using=using):
+            self.db_manager(using).filter(content_type=content_type, field=field.name).delete()
+            self.db_manager(using).bulk_create(
+                [
+                    StateCounter(
+                        content_type=content_type,
+                        field=field.name,
+                        state=_state_value(state),
+                        count=count,
+                    )
+                    for state, count in counts.items()
+                ]
+            )
+        return dict(counts)
+
+
+class StateCounter(models.Model):
+    """
+    Number of rows in a state
+    """
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    field = models.CharField(max_length=255)
+    state = models.CharField(max_length=255, null=True, blank=True)
+    count = models.BigIntegerField(default=0)
+
+    objects = StateCounterManager()
+
+    class Meta:
+        unique_together = [("content_type", "field", "state")]
+
+    def __str__(self):
+        return "{0}.{1} {2}: {3}".format(self.content_type, self.field, self.state, self.count)
+
+
+_counted_fields = {}  # model class -> [counted FSM fields]
+
+
+def counted_fields(model):
+    try:
+        return _counted_fields[model]
+    except KeyError:
+        fields = _counted_fields[model] = [
+            field
+            for field in model._meta.concrete_fields
+            if getattr(field, "count_states", False)
+        ]
+        return fields
+
+
+def _is_saved(field, update_fields):
+    return update_fields is None or field.name in update_fields or field.attname in update_fields
+
+
+def _locked_states(model, pk, fields, using):
+    """
+    {attname: state} of the fields as stored in the row, locked until the
+    end of the transaction, or None if there is no such row
+    """
+    return (
+        model._base_manager.using(using)
+        .select_for_update()
+        .filter(pk=pk)
+        .values(*[field.attname for field in fields])
+        .first()
+    )
+
+
+class StateCountersMixin(object):
+    """
+    Required by models with FSMField(count_states=True).
+
+    The row is written and the counters are moved in one transaction,
+    from the state stored in the row, locked with SELECT ... FOR UPDATE
+    before the write. Transitions of instances that are not saved, or
+    whose save fails, are not counted, and concurrent saves of stale
+    copies don't count the same move twice.
+    """
+
+    def save_base(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        fields = [
+            field
+            for field in counted_fields(self.__class__)
+            if field.attname in self.__dict__ and _is_saved(field, update_fields)
+        ]
+        if not fields:
+            return super(StateCountersMixin, self).save_base(*args, **kwargs)
+
+        using = kwargs.get("using") or router.db_for_write(self.__class__, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            stored = None
+            if self.pk is not None:
+                stored = _locked_states(self.__class__, self.pk, fields, using)
+            super(StateCountersMixin, self).save_base(*args, **kwargs)
+
+            for field in fields:
+                state = self.__dict__[field.attname]
+                if stored is None:
+                    deltas = {state: 1}
+                elif stored[field.attname] != state:
+                    deltas = {stored[field.attname]: -1, state: 1}
+                else:
+                    continue
+                StateCounter.objects.add(self.__class__, field, deltas, using=using)
+
+
+def on_pre_delete(sender, instance, using=None, **kwargs):
+    # sent within the delete transaction
+    fields = counted_fields(sender)
+    stored = _locked_states(sender, instance.pk, fields, using)
+    if stored is None:
+        return
+    for field in fields:
+        StateCounter.objects.add(sender, field, {stored[field.attname]: -1}, using=using)
+
+
+def connect_receivers(model):
+    """
+    Connects the delete receiver for a model with counted fields. Other
+    models get no receivers, so their deletes can still be fast
+    """
+    if counted_fields(model):
+        pre_delete.connect(on_pre_delete, sender=model, dispatch_uid="django_fsm.counters")
+
+
+def on_class_prepared(sender, **kwargs):
+    connect_receivers(sender)
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+In-memory transitions graph of an FSM field
+"""
+import hashlib
+from collections import OrderedDict, deque
+from itertools import chain
+
+from django.utils.functional import cached_property
+
+try:
+    from django.utils.encoding import force_text
+except ImportError:  # Django >= 4.0
+    from django.utils.encoding import force_str as force_text
+
+ANY_STATE = "*"
+ANY_EXCEPT_TARGET = "+"
+WILDCARDS = (ANY_STATE, ANY_EXCEPT_TARGET)
+
+
+def _states(state):
+    """
+    Possible states of a transition source or target. Dynamic GET_STATE and
+    RETURN_VALUE targets give their allowed states, if declared
+    """
+    if hasattr(state, "get_state"):
+        return state.allowed_states or ()
+    return (state,)
+
+
+class StateGraph(object):
+    """
+    States and transitions of a field, indexed by source state.
+
+    Transitions from "*" and "+" are kept as single symbolic edges in
+    `wildcard_edges` instead of an edge from every state, use `expand_wildcards`
+    to enumerate them. Transitions without target keep the source state, a
+    wildcard edge without target stands for a loop on every state.
+
+    Analysis results are computed on first access, use `field.graph(model)`
+    to get a graph shared by all callers.
+    """
+
+    def __init__(self, field, model):
+        self.field = field
+        self.model = model
+        self.states = OrderedDict()
+        self.edges = []
+        self.error_edges = []  # [(source, on_error state)]
+        self.wildcard_edges = []
+        self.outgoing = {}
+
+        for transition in field.get_all_transitions(model):
+            self.add_transition(transition)
+
+    def add_state(self, state):
+        self.states.setdefault(state, None)
+
+    def add_transition(self, transition):
+        if transition.source in WILDCARDS:
+            for target in _states(transition.target):
+                if target is not None:
+                    self.add_state(target)
+                self.wildcard_edges.append((transition.source, target, transition.name))
+            return
+
+        for source in _states(transition.source):
+            self.add_state(source)
+            outgoing = self.outgoing.setdefault(source, [])
+            if transition.on_error and (source, transition.on_error) not in self.error_edges:
+                self.add_state(transition.on_error)
+                self.error_edges.append((source, transition.on_error))
+            for target in _states(transition.target):
+                if target is None:
+                    target = source
+                self.add_state(target)
+                self.edges.append((source, target, transition.name))
+                outgoing.append((target, transition.name))
+
+    def expand_wildcards(self):
+        """
+        Yields (source, target, name) for every state a wildcard transition is allowed from
+        """
+        for wildcard, target, name in self.wildcard_edges:
+            for source in self.states:
+                if target is None:
+                    yield source, source, name
+                elif wildcard == ANY_EXCEPT_TARGET and source == target:
+                    continue
+                else:
+                    yield source, target, name
+
+    def final_states(self):
+        """
+        States without any transition allowed from them
+        """
+        wildcard_targets = set()
+        for wildcard, target, _ in self.wildcard_edges:
+            if wildcard == ANY_STATE:
+                return []
+            wildcard_targets.add(target)
+
+        return [
+            state
+            for state in self.states
+            if state not in self.outgoing
+            and (not wildcard_targets or wildcard_targets == set([state]))
+        ]
+
+    @cached_property
+    def initial_state(self):
+        field = self.field
+        if field.has_default() and not callable(field.default):
+            return field.default
+        return None
+
+    @cached_property
+    def terminal_states(self):
+        return self.final_states()
+
+    @cached_property
+    def _adjacency(self):
+        """
+        {state: [(source, target, name)]} of outgoing and incoming edges, wildcards expanded.
+        on_error edges have None name
+        """
+        out_edges = dict((state, []) for state in self.states)
+        in_edges = dict((state, []) for state in self.states)
+        edges = chain(
+            self.edges,
+            ((source, target, None) for source, target in self.error_edges),
+            self.expand_wildcards(),
+        )
+        for edge in edges:
+            out_edges[edge[0]].append(edge)
+            in_edges[edge[1]].append(edge)
+        return out_edges, in_edges
+
+    def out_edges(self, state):
+        """
+        [(state, target, name)] of transitions allowed from the state, name is None for on_error edges
+        """
+        return self._adjacency[0].get(state, [])
+
+    def in_edges(self, state):
+        """
+        [(source, state, name)] of transitions leading to the state, name is None for on_error edges
+        """
+        return self._adjacency[1].get(state, [])
+
+    def _walk(self, states, edges):
+        seen = set(states)
+        queue = deque(states)
+        while queue:
+            for edge in edges(queue.popleft()):
+                for state in edge[:2]:
+                    if state not in seen:
+                        seen.add(state)
+                        queue.append(state)
+        return seen
+
+    @cached_property
+    def reachable_states(self):
+        """
+        States reachable from the initial state, including it
+        """
+        if self.initial_state is None:
+            return set(self.states)
+        return self._walk([self.initial_state], self.out_edges)
+
+    @cached_property
+    def unreachable_states(self):
+        return [state for state in self.states if state not in self.reachable_states]
+
+    @cached_property
+    def dead_end_states(self):
+        """
+        Non terminal states without a path to any terminal state. Empty if
+        the machine has no terminal states at all
+        """
+        terminal_states = self.terminal_states
+        if not terminal_states:
+            return []
+        leading_to_terminal = self._walk(terminal_states, self.in_edges)
+        return [state for state in self.states if state not in leading_to_terminal]
+
+    @cached_property
+    def strongly_connected_components(self):
+        """
+        Lists of states, in reverse topological order of the components (Tarjan's algorithm)
+        """
+        index, lowlink, on_stack = {}, {}, set()
+        stack, components = [], []
+
+        for root in self.states:
+            if root in index:
+                continue
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self.out_edges(root)))]
+            while work:
+                state, edges = work[-1]
+                for _, target, _ in edges:
+                    if target not in index:
+                        index[target] = lowlink[target] = len(index)
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(self.out_edges(target))))
+                        break
+                    elif target in on_stack:
+                        lowlink[state] = min(lowlink[state], index[target])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[state])
+                    if lowlink[state] == index[state]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == state:
+                                break
+                        components.append(component)
+        return components
+
+
+def _state_key(state):
+    if hasattr(state, "get_state"):
+        return ("dynamic", tuple(force_text(allowed) for allowed in state.allowed_states or ()))
+    return force_text(state) if state is not None else None
+
+
+def transitions_fingerprint(field, model, *extra):
+    """
+    Hash of the field states definition, changes with any transition name,
+    source, target or on_error, the default state, or the extra values
+    """
+    transitions = sorted(
+        (transition.name, _state_key(transition.source), _state_key(transition.target), _state_key(transition.on_error))
+        for transition in field.get_all_transitions(model)
+    )
+    choices = [(force_text(value), force_text(label)) for value, label in field.choices or ()]
+    default = _state_key(field.default) if field.has_default() and not callable(field.default) else None
+    data = repr((transitions, choices, default, extra))
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
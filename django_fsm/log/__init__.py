@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+Optional transition log.
+
+Add "django_fsm.log" to INSTALLED_APPS to record every transition
+into the TransitionLog model.
+"""
+import django
+
+if django.VERSION < (3, 2):
+    default_app_config = "django_fsm.log.apps.TransitionLogConfig"
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+from django.apps import AppConfig
+
+
+class TransitionLogConfig(AppConfig):
+    name = "django_fsm.log"
+    label = "fsm_log"
+    default_auto_field = "django.db.models.AutoField"
+    verbose_name = "Transition log"
+
+    def ready(self):
+        from django_fsm.log.recorder import recorder
+        from django_fsm.signals import post_transition
+
+        post_transition.connect(recorder.on_post_transition, dispatch_uid="django_fsm.log")
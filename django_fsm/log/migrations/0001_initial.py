@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransitionLog',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.CharField(max_length=255)),
+                ('field', models.CharField(max_length=255)),
+                ('transition', models.CharField(max_length=255)),
+                ('source', models.CharField(blank=True, max_length=255, null=True)),
+                ('target', models.CharField(blank=True, max_length=255, null=True)),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('user', models.ForeignKey(
+                    blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL
+                )),
+            ],
+            options={
+                'indexes': [models.Index(fields=['content_type', 'object_id', 'timestamp'], name='fsm_log_object_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.utils import timezone
+
+
+class TransitionLog(models.Model):
+    """
+    Executed transition record
+    """
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.CharField(max_length=255)
+    field = models.CharField(max_length=255)
+    transition = models.CharField(max_length=255)
+    source = models.CharField(max_length=255, null=True, blank=True)
+    target = models.CharField(max_length=255, null=True, blank=True)
+    timestamp = models.DateTimeField(default=timezone.now)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["content_type", "object_id", "timestamp"],
+                name="fsm_log_object_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return "{0}.{1} {2}: {3} -> {4}".format(
+            self.content_type, self.object_id, self.transition, self.source, self.target
+        )
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import threading
+from functools import partial
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, router, transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from django_fsm.log.models import TransitionLog
+
+
+def _to_text(state):
+    return None if state is None else str(state)
+
+
+class TransitionLogRecorder(object):
+    """
+    Buffers transition records per transaction and writes them with one
+    bulk_create on commit. Records of a rolled back transaction or
+    savepoint are dropped.
+
+    Long transactions are flushed every `flush_size` records, defaults to
+    settings.DJANGO_FSM_LOG_FLUSH_SIZE or 500.
+
+    The user is taken from the `by` transition method keyword argument.
+    Transitions of new objects are recorded once the object is saved, and
+    are not logged if it never is.
+    """
+
+    def __init__(self, flush_size=None):
+        self._flush_size = flush_size
+        self._local = threading.local()
+
+    @property
+    def flush_size(self):
+        if self._flush_size is not None:
+            return self._flush_size
+        return getattr(settings, "DJANGO_FSM_LOG_FLUSH_SIZE", 500)
+
+    def on_post_transition(self, sender, instance, name, source, target, **kwargs):
+        self.record(
+            instance,
+            field=kwargs["field"],
+            name=name,
+            source=source,
+            target=target,
+            user=(kwargs.get("method_kwargs") or {}).get("by"),
+        )
+
+    def record(self, instance, field, name, source, target, user=None):
+        if getattr(user, "pk", None) is None:
+            user = None
+        entry = (instance, field, name, source, target, user, timezone.now())
+        if instance.pk is None:
+            self._defer(instance, entry)
+        else:
+            self._add(instance, entry)
+
+    def _defer(self, instance, entry):
+        # the object id is known only after the insert
+        pending = getattr(instance._state, "fsm_log_pending", None)
+        if pending is None:
+            pending = instance._state.fsm_log_pending = []
+            post_save.connect(self.on_post_save, sender=instance.__class__, dispatch_uid="django_fsm.log")
+        pending.append(entry)
+
+    def on_post_save(self, sender, instance, **kwargs):
+        pending = instance._state.__dict__.pop("fsm_log_pending", None)
+        for entry in pending or []:
+            self._add(instance, entry)
+
+    def _add(self, instance, entry):
+        using = router.db_for_write(TransitionLog, instance=instance)
+        connection = connections[using]
+        if not connection.in_atomic_block:
+            self.flush(using, [entry])
+            return
+
+        buffer = self._get_buffer(using, connection)
+        buffer.append(entry)
+        if len(buffer) >= self.flush_size:
+            self.flush(using, buffer)
+
+    def _get_buffer(self, using, connection):
+        """
+        Buffer of the current savepoint, flushed on commit.
+
+        Django drops on_commit callbacks of rolled back savepoints, so a
+        buffer is alive while its callback is pending.
+        """
+        pending = set(id(item[1]) for item in connection.run_on_commit)
+        buffers = getattr(self._local, "buffers", {})
+        self._local.buffers = buffers = dict(
+            (key, value)
+            for key, value in buffers.items()
+            if key[0] != using or id(value[1]) in pending
+        )
+
+        key = (using, tuple(connection.savepoint_ids))
+        if key not in buffers:
+            buffer = []
+            callback = partial(self.flush, using, buffer)
+            transaction.on_commit(callback, using=using)
+            buffers[key] = (buffer, callback)
+        return buffers[key][0]
+
+    def flush(self, using, buffer):
+        logs = [
+            TransitionLog(
+                content_type=ContentType.objects.db_manager(using).get_for_model(
+                    instance.__class__
+                ),
+                object_id=str(instance.pk),
+                field=field.name,
+                transition=name,
+                source=_to_text(source),
+                target=_to_text(target),
+                user=user,
+                timestamp=timestamp,
+            )
+            for instance, field, name, source, target, user, timestamp in buffer
+            if instance.pk is not None
+        ]
+        del buffer[:]
+        if logs:
+            TransitionLog.objects.using(using).bulk_create(logs)
+
+
+recorder = TransitionLogRecorder()
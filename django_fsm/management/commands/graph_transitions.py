@@ -1,7 +1,8 @@
 # -*- coding: utf-8; mode: django -*-
-import graphviz
+import json
+import multiprocessing
+import os
 from optparse import make_option
-from itertools import chain
 
 from django.core.management.base import BaseCommand
 try:
@@ -12,7 +13,8 @@ except ImportError:  # Django >= 4.0
     from django.core.management.base import ALL_CHECKS
     _requires_system_checks = ALL_CHECKS
 
-from django_fsm import FSMFieldMixin, GET_STATE, RETURN_VALUE
+from django_fsm import FSMFieldMixin
+from django_fsm.graph import StateGraph, transitions_fingerprint
 
 try:
     from django.db.models import get_apps, get_app, get_models, get_model
@@ -47,72 +49,66 @@ def node_label(field, state):
         return state
 
 
-def generate_dot(fields_data):
+def cluster_name(field):
+    opts = field.model._meta
+    return "cluster_%s_%s_%s" % (opts.app_label, opts.object_name, field.name)
+
+
+def cluster_label(field):
+    opts = field.model._meta
+    return "%s.%s.%s" % (opts.app_label, opts.object_name, field.name)
+
+
+def graph_elements(field, model, collapse_wildcards=False):
+    """
+    Returns nodes [(name, attrs)] and edges [(source name, target name, attrs)] to draw
+    """
+    # not field.graph(model), exporting all models shouldn't keep every graph cached
+    graph = StateGraph(field, model)
+    names = dict((state, node_name(field, state)) for state in graph.states)
+    nodes, edges = [], []
+
+    final_states = set(graph.final_states())
+    for state, name in names.items():
+        shape = "doublecircle" if state in final_states else "circle"
+        nodes.append((name, [("label", str(node_label(field, state))), ("shape", shape)]))
+        if field.default is not None and state == field.default:  # Adding initial state notation
+            initial_name = node_name(field, "_initial")
+            nodes.append((initial_name, [("label", ""), ("shape", "point")]))
+            edges.append((initial_name, name, []))
+
+    for source, target, transition_name in graph.edges:
+        edges.append((names[source], names[target], [("label", transition_name)]))
+    for source, target in graph.error_edges:
+        edges.append((names[source], names[target], [("style", "dotted")]))
+
+    if collapse_wildcards:
+        if graph.wildcard_edges:
+            any_name = node_name(field, "_any")
+            nodes.append((any_name, [("label", "any state"), ("shape", "box"), ("style", "dashed")]))
+            for wildcard, target, transition_name in graph.wildcard_edges:
+                label = transition_name if wildcard == "*" else "%s (%s)" % (transition_name, wildcard)
+                target_name = any_name if target is None else names[target]
+                edges.append((any_name, target_name, [("label", label), ("style", "dashed")]))
+    else:
+        for source, target, transition_name in graph.expand_wildcards():
+            edges.append((names[source], names[target], [("label", transition_name)]))
+
+    return nodes, edges
+
+
+def generate_dot(fields_data, collapse_wildcards=False):
+    import graphviz
+
     result = graphviz.Digraph()
 
     for field, model in fields_data:
-        sources, targets, edges, any_targets, any_except_targets = set(), set(), set(), set(), set()
-
-        # dump nodes and edges
-        for transition in field.get_all_transitions(model):
-            if transition.source == "*":
-                any_targets.add((transition.target, transition.name))
-            elif transition.source == "+":
-                any_except_targets.add((transition.target, transition.name))
-            else:
-                _targets = (
-                    (state for state in transition.target.allowed_states)
-                    if isinstance(transition.target, (GET_STATE, RETURN_VALUE))
-                    else (transition.target,)
-                )
-                source_name_pair = (
-                    ((state, node_name(field, state)) for state in transition.source.allowed_states)
-                    if isinstance(transition.source, (GET_STATE, RETURN_VALUE))
-                    else ((transition.source, node_name(field, transition.source)),)
-                )
-                for source, source_name in source_name_pair:
-                    if transition.on_error:
-                        on_error_name = node_name(field, transition.on_error)
-                        targets.add((on_error_name, node_label(field, transition.on_error)))
-                        edges.add((source_name, on_error_name, (("style", "dotted"),)))
-                    for target in _targets:
-                        add_transition(source, target, transition.name, source_name, field, sources, targets, edges)
-
-        targets.update(
-            set((node_name(field, target), node_label(field, target)) for target, _ in chain(any_targets, any_except_targets))
-        )
-        for target, name in any_targets:
-            target_name = node_name(field, target)
-            all_nodes = sources | targets
-            for source_name, label in all_nodes:
-                sources.add((source_name, label))
-                edges.add((source_name, target_name, (("label", name),)))
-
-        for target, name in any_except_targets:
-            target_name = node_name(field, target)
-            all_nodes = sources | targets
-            all_nodes.remove(((target_name, node_label(field, target))))
-            for source_name, label in all_nodes:
-                sources.add((source_name, label))
-                edges.add((source_name, target_name, (("label", name),)))
+        nodes, edges = graph_elements(field, model, collapse_wildcards=collapse_wildcards)
 
         # construct subgraph
-        opts = field.model._meta
-        subgraph = graphviz.Digraph(
-            name="cluster_%s_%s_%s" % (opts.app_label, opts.object_name, field.name),
-            graph_attr={"label": "%s.%s.%s" % (opts.app_label, opts.object_name, field.name)},
-        )
-
-        final_states = targets - sources
-        for name, label in final_states:
-            subgraph.node(name, label=str(label), shape="doublecircle")
-        for name, label in (sources | targets) - final_states:
-            subgraph.node(name, label=str(label), shape="circle")
-            if field.default:  # Adding initial state notation
-                if label == field.default:
-                    initial_name = node_name(field, "_initial")
-                    subgraph.node(name=initial_name, label="", shape="point")
-                    subgraph.edge(initial_name, name)
+        subgraph = graphviz.Digraph(name=cluster_name(field), graph_attr={"label": cluster_label(field)})
+        for name, attrs in nodes:
+            subgraph.node(name, **dict(attrs))
         for source_name, target_name, attrs in edges:
             subgraph.edge(source_name, target_name, **dict(attrs))
 
@@ -121,11 +117,204 @@ def generate_dot(fields_data):
     return result
 
 
-def add_transition(transition_source, transition_target, transition_name, source_name, field, sources, targets, edges):
-    target_name = node_name(field, transition_target)
-    sources.add((source_name, node_label(field, transition_source)))
-    targets.add((target_name, node_label(field, transition_target)))
-    edges.add((source_name, target_name, (("label", transition_name),)))
+def dot_quote(value):
+    return '"%s"' % force_text(value).replace('"', '\\"')
+
+
+def dot_attrs(attrs):
+    if not attrs:
+        return ""
+    return " [%s]" % " ".join("%s=%s" % (key, dot_quote(value)) for key, value in attrs)
+
+
+def write_dot(fields_data, out, collapse_wildcards=False):
+    """
+    Writes the graph in DOT language, field by field, without graphviz package
+    """
+    out.write("digraph {\n")
+    for field, model in fields_data:
+        nodes, edges = graph_elements(field, model, collapse_wildcards=collapse_wildcards)
+        out.write("\tsubgraph %s {\n" % dot_quote(cluster_name(field)))
+        out.write("\t\tgraph [label=%s]\n" % dot_quote(cluster_label(field)))
+        for name, attrs in nodes:
+            out.write("\t\t%s%s\n" % (dot_quote(name), dot_attrs(attrs)))
+        for source_name, target_name, attrs in edges:
+            out.write("\t\t%s -> %s%s\n" % (dot_quote(source_name), dot_quote(target_name), dot_attrs(attrs)))
+        out.write("\t}\n")
+    out.write("}\n")
+
+
+def mermaid_label(value):
+    return force_text(value).replace('"', "'")
+
+
+def write_mermaid(fields_data, out, collapse_wildcards=False):
+    """
+    Writes a Mermaid state diagram, with a composite state for each field
+    """
+    out.write("stateDiagram-v2\n")
+    for field, model in fields_data:
+        graph = StateGraph(field, model)
+        prefix = cluster_name(field)[len("cluster_"):]
+        ids = dict((state, "%s_%d" % (prefix, index)) for index, state in enumerate(graph.states))
+
+        out.write('    state "%s" as %s {\n' % (mermaid_label(cluster_label(field)), prefix))
+        final_states = set(graph.final_states())
+        for state, state_id in ids.items():
+            out.write('        state "%s" as %s\n' % (mermaid_label(node_label(field, state)), state_id))
+            if field.default is not None and state == field.default:
+                out.write("        [*] --> %s\n" % state_id)
+            if state in final_states:
+                out.write("        %s --> [*]\n" % state_id)
+
+        for source, target, transition_name in graph.edges:
+            out.write("        %s --> %s : %s\n" % (ids[source], ids[target], mermaid_label(transition_name)))
+        for source, target in graph.error_edges:
+            out.write("        %s --> %s : error\n" % (ids[source], ids[target]))
+
+        if collapse_wildcards:
+            if graph.wildcard_edges:
+                any_id = "%s_any" % prefix
+                out.write('        state "any state" as %s\n' % any_id)
+                for wildcard, target, transition_name in graph.wildcard_edges:
+                    label = transition_name if wildcard == "*" else "%s (%s)" % (transition_name, wildcard)
+                    target_id = any_id if target is None else ids[target]
+                    out.write("        %s --> %s : %s\n" % (any_id, target_id, mermaid_label(label)))
+        else:
+            for source, target, transition_name in graph.expand_wildcards():
+                out.write("        %s --> %s : %s\n" % (ids[source], ids[target], mermaid_label(transition_name)))
+        out.write("    }\n")
+
+
+def graph_json(field, model):
+    graph = StateGraph(field, model)
+    opts = model._meta
+    final_states = set(graph.final_states())
+    return {
+        "app_label": opts.app_label,
+        "model": opts.object_name,
+        "field": field.name,
+        "initial": field.default if field.has_default() and not callable(field.default) else None,
+        "states": [
+            {"state": state, "label": force_text(node_label(field, state)), "final": state in final_states}
+            for state in graph.states
+        ],
+        "adjacency": [
+            {"source": source, "transitions": [{"target": target, "name": name} for target, name in outgoing]}
+            for source, outgoing in graph.outgoing.items()
+        ],
+        "error_transitions": [{"source": source, "target": target} for source, target in graph.error_edges],
+        "wildcard_transitions": [
+            {"source": wildcard, "target": target, "name": name} for wildcard, target, name in graph.wildcard_edges
+        ],
+    }
+
+
+def write_json(fields_data, out, collapse_wildcards=False):
+    """
+    Writes {"fields": [...]} with the adjacency of each field, wildcard transitions are kept symbolic
+    """
+    out.write('{"fields": [\n')
+    for index, (field, model) in enumerate(fields_data):
+        out.write("%s%s\n" % ("," if index else "", json.dumps(graph_json(field, model), default=force_text)))
+    out.write("]}\n")
+
+
+WRITERS = {
+    "dot": write_dot,
+    "json": write_json,
+    "mermaid": write_mermaid,
+}
+
+FORMAT_EXTENSIONS = {
+    "dot": "dot",
+    "gv": "dot",
+    "json": "json",
+    "mmd": "mermaid",
+    "mermaid": "mermaid",
+}
+
+
+SPLIT_MANIFEST = ".graph_transitions.json"
+
+
+def split_file_name(field, model, extension):
+    opts = model._meta
+    return "%s.%s.%s.%s" % (opts.app_label, opts.object_name, field.name, extension)
+
+
+def render_field(task):
+    """
+    Writes a single field graph file, the task is picklable for the process pool
+    """
+    app_label, model_name, field_name, path, extension, layout, collapse_wildcards = task
+    if NEW_META_API:
+        model = apps.get_model(app_label, model_name)
+    else:
+        model = get_model(app_label, model_name)
+    fields_data = [(model._meta.get_field(field_name), model)]
+
+    output_format = FORMAT_EXTENSIONS.get(extension)
+    if output_format is not None:
+        with open(path, "w") as out:
+            WRITERS[output_format](fields_data, out, collapse_wildcards=collapse_wildcards)
+    else:
+        graph = generate_dot(fields_data, collapse_wildcards=collapse_wildcards)
+        graph.engine = layout
+        graph.format = extension
+        graph.render(path[: -len(extension) - 1], cleanup=True)
+    return path
+
+
+def setup_worker():
+    import django
+
+    if hasattr(django, "setup"):
+        django.setup()
+
+
+def write_split(fields_data, output_dir, extension="dot", layout="dot", collapse_wildcards=False, jobs=1, force=False):
+    """
+    Writes a file per field into output_dir, skipping fields with unchanged transitions since
+    the last run. Returns (written, unchanged) file names
+    """
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    manifest_path = os.path.join(output_dir, SPLIT_MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    tasks, unchanged = [], []
+    for field, model in fields_data:
+        file_name = split_file_name(field, model, extension)
+        path = os.path.join(output_dir, file_name)
+        fingerprint = transitions_fingerprint(
+            field, model, force_text(field.model._meta.verbose_name), extension, layout, collapse_wildcards
+        )
+        if not force and manifest.get(file_name) == fingerprint and os.path.exists(path):
+            unchanged.append(file_name)
+            continue
+        manifest[file_name] = fingerprint
+        opts = model._meta
+        tasks.append((opts.app_label, opts.object_name, field.name, path, extension, layout, collapse_wildcards))
+
+    if jobs > 1 and len(tasks) > 1:
+        pool = multiprocessing.Pool(min(jobs, len(tasks)), initializer=setup_worker)
+        try:
+            written = pool.map(render_field, tasks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        written = [render_field(task) for task in tasks]
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    return [os.path.basename(path) for path in written], unchanged
 
 
 def get_graphviz_layouts():
@@ -148,7 +337,8 @@ class Command(BaseCommand):
                 action="store",
                 dest="outputfile",
                 help=(
-                    "Render output file. Type of output dependent on file extensions. " "Use png or jpg to render graph to image."
+                    "Render output file. Type of output dependent on file extensions. "
+                    "Use dot, gv, json or mmd to write text, png or jpg to render graph to image."
                 ),
             ),
             # NOQA
@@ -160,6 +350,51 @@ class Command(BaseCommand):
                 default="dot",
                 help=("Layout to be used by GraphViz for visualization. " "Layouts: %s." % " ".join(get_graphviz_layouts())),
             ),
+            make_option(
+                "--format",
+                "-f",
+                action="store",
+                dest="format",
+                choices=sorted(WRITERS),
+                help="Text output format: dot, json or mermaid. Default is taken from the output file extension.",
+            ),
+            make_option(
+                "--collapse-wildcards",
+                action="store_true",
+                dest="collapse_wildcards",
+                default=False,
+                help="Draw transitions from * and + sources once, from a single 'any state' node.",
+            ),
+            make_option(
+                "--output-dir",
+                action="store",
+                dest="output_dir",
+                help="Write a file per app.Model.field into the directory, regenerating only changed ones.",
+            ),
+            make_option(
+                "--extension",
+                "-e",
+                action="store",
+                dest="extension",
+                default="dot",
+                help="Output files extension with --output-dir: dot, gv, json, mmd, or an image format to render.",
+            ),
+            make_option(
+                "--jobs",
+                "-j",
+                action="store",
+                dest="jobs",
+                type="int",
+                default=1,
+                help="Number of processes rendering files with --output-dir.",
+            ),
+            make_option(
+                "--force",
+                action="store_true",
+                dest="force",
+                default=False,
+                help="Regenerate all files with --output-dir, even unchanged ones.",
+            ),
         )
         args = "[appname[.model[.field]]]"
     else:
@@ -171,7 +406,8 @@ class Command(BaseCommand):
                 action="store",
                 dest="outputfile",
                 help=(
-                    "Render output file. Type of output dependent on file extensions. " "Use png or jpg to render graph to image."
+                    "Render output file. Type of output dependent on file extensions. "
+                    "Use dot, gv, json or mmd to write text, png or jpg to render graph to image."
                 ),
             )
             parser.add_argument(
@@ -182,9 +418,54 @@ class Command(BaseCommand):
                 default="dot",
                 help=("Layout to be used by GraphViz for visualization. " "Layouts: %s." % " ".join(get_graphviz_layouts())),
             )
+            parser.add_argument(
+                "--format",
+                "-f",
+                action="store",
+                dest="format",
+                choices=sorted(WRITERS),
+                help="Text output format: dot, json or mermaid. Default is taken from the output file extension.",
+            )
+            parser.add_argument(
+                "--collapse-wildcards",
+                action="store_true",
+                dest="collapse_wildcards",
+                default=False,
+                help="Draw transitions from * and + sources once, from a single 'any state' node.",
+            )
+            parser.add_argument(
+                "--output-dir",
+                action="store",
+                dest="output_dir",
+                help="Write a file per app.Model.field into the directory, regenerating only changed ones.",
+            )
+            parser.add_argument(
+                "--extension",
+                "-e",
+                action="store",
+                dest="extension",
+                default="dot",
+                help="Output files extension with --output-dir: dot, gv, json, mmd, or an image format to render.",
+            )
+            parser.add_argument(
+                "--jobs",
+                "-j",
+                action="store",
+                dest="jobs",
+                type=int,
+                default=1,
+                help="Number of processes rendering files with --output-dir.",
+            )
+            parser.add_argument(
+                "--force",
+                action="store_true",
+                dest="force",
+                default=False,
+                help="Regenerate all files with --output-dir, even unchanged ones.",
+            )
             parser.add_argument("args", nargs="*", help=("[appname[.model[.field]]]"))
 
-    help = "Creates a GraphViz dot file with transitions for selected fields"
+    help = "Creates a GraphViz dot, JSON or Mermaid file with transitions for selected fields"
 
     def render_output(self, graph, **options):
         filename, format = options["outputfile"].rsplit(".", 1)
@@ -201,8 +482,7 @@ class Command(BaseCommand):
 
                 if len(field_spec) == 1:
                     if NEW_META_API:
-                        app = apps.get_app(field_spec[0])
-                        models = apps.get_models(app)
+                        models = apps.get_app_config(field_spec[0]).get_models()
                     else:
                         app = get_app(field_spec[0])
                         models = get_models(app)
@@ -229,9 +509,29 @@ class Command(BaseCommand):
                     for model in get_models(app):
                         fields_data += all_fsm_fields_data(model)
 
-        dotdata = generate_dot(fields_data)
-
-        if options["outputfile"]:
-            self.render_output(dotdata, **options)
+        output_format = options["format"]
+        collapse_wildcards = options["collapse_wildcards"]
+
+        if options["output_dir"]:
+            written, unchanged = write_split(
+                fields_data,
+                options["output_dir"],
+                extension=options["extension"],
+                layout=options["layout"],
+                collapse_wildcards=collapse_wildcards,
+                jobs=options["jobs"],
+                force=options["force"],
+            )
+            self.stdout.write("%d files written, %d unchanged" % (len(written), len(unchanged)))
+        elif options["outputfile"]:
+            if output_format is None:
+                extension = options["outputfile"].rsplit(".", 1)[-1].lower()
+                output_format = FORMAT_EXTENSIONS.get(extension)
+            if output_format is None:
+                dotdata = generate_dot(fields_data, collapse_wildcards=collapse_wildcards)
+                self.render_output(dotdata, **options)
+            else:
+                with open(options["outputfile"], "w") as out:
+                    WRITERS[output_format](fields_data, out, collapse_wildcards=collapse_wildcards)
         else:
-            print(dotdata)
+            WRITERS[output_format or "dot"](fields_data, self.stdout, collapse_wildcards=collapse_wildcards)
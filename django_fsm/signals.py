@@ -3,3 +3,7 @@ from django.dispatch import Signal
 
 pre_transition = Signal()
 post_transition = Signal()
+
+# Sent once per batch by bulk transitions, see FSMQuerySet.fsm_transition
+pre_bulk_transition = Signal()
+post_bulk_transition = Signal()
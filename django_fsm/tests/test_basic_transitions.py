@@ -1,7 +1,7 @@
 from django.db import models
 from django.test import TestCase
 
-from django_fsm import FSMField, TransitionNotAllowed, transition, can_proceed, Transition
+from django_fsm import FSMField, FSMQuerySet, TransitionNotAllowed, transition, can_proceed, Transition
 from django_fsm.signals import pre_transition, post_transition
 
 
@@ -138,6 +138,17 @@ class StateSignalsTests(TestCase):
         self.assertFalse(self.pre_transition_called)
         self.assertFalse(self.post_transition_called)
 
+    def test_signals_sent_without_sender(self):
+        post_transition.send(
+            sender=None,
+            instance=self.model,
+            name="publish",
+            field=BlogPost._meta.get_field("state"),
+            source="new",
+            target="new",
+        )
+        self.assertFalse(self.post_transition_called)
+
 
 class TestFieldTransitionsInspect(TestCase):
     def setUp(self):
@@ -236,3 +247,37 @@ class TestFieldTransitionsInspect(TestCase):
             ]
         )
         self.assertEqual(actual, expected)
+
+    def test_available_conditions_from_undeclared_state(self):
+        self.model.state = "archived"
+        transitions = self.model.get_available_state_transitions()
+        actual = set((transition.source, transition.target) for transition in transitions)
+        expected = set([("*", "moderated"), ("*", ""), ("+", "blocked")])
+        self.assertEqual(actual, expected)
+
+    def test_state_transitions_index(self):
+        field = BlogPost._meta.get_field("state")
+        self.assertEqual(
+            ["block", "empty", "hide", "moderate", "notify_all", "steal"],
+            [transition.name for transition in field.get_state_transitions(BlogPost, "published")],
+        )
+        self.assertEqual(
+            ["empty", "moderate"],
+            [transition.name for transition in field.get_state_transitions(BlogPost, "blocked")],
+        )
+
+    def test_filter_can_proceed_matches_can_proceed(self):
+        for state in ["new", "published", "hidden", "blocked", ""]:
+            BlogPost.objects.create(state=state)
+
+        queryset = FSMQuerySet(model=BlogPost)
+        for name in ["publish", "notify_all", "steal", "moderate", "block", "empty"]:
+            expected = [post.pk for post in BlogPost.objects.all() if can_proceed(getattr(post, name))]
+            self.assertEqual(sorted(expected), sorted(queryset.filter_can_proceed(name).values_list("pk", flat=True)))
+
+    def test_allowed_transition_lookup(self):
+        meta = BlogPost.block._django_fsm
+        self.assertEqual("block", meta.get_allowed_transition("new").name)
+        self.assertIsNone(meta.get_allowed_transition("blocked"))
+        self.assertIsNone(BlogPost.hide._django_fsm.get_allowed_transition("new"))
+        self.assertEqual("moderate", BlogPost.moderate._django_fsm.get_allowed_transition("any").name)
@@ -1,6 +1,6 @@
 from django.db import models
 from django.test import TestCase
-from django_fsm import FSMField, TransitionNotAllowed, transition, can_proceed
+from django_fsm import FSMField, TransitionNotAllowed, transition, can_proceed, condition, condition_cache
 
 
 def condition_func(instance):
@@ -44,3 +44,65 @@ class ConditionalTest(TestCase):
         self.assertRaises(TransitionNotAllowed, self.model.destroy)
 
         self.assertTrue(can_proceed(self.model.destroy, check_conditions=False))
+
+
+calls = []
+
+
+def is_paid(instance):
+    calls.append("is_paid")
+    return True
+
+
+@condition(cost=10)
+def has_documents(instance):
+    calls.append("has_documents")
+    return True
+
+
+@condition(cacheable=False)
+def is_open(instance):
+    calls.append("is_open")
+    return True
+
+
+class OrderWithSharedConditions(models.Model):
+    state = FSMField(default="new")
+
+    @transition(field=state, source="new", target="approved", conditions=[has_documents, is_paid, is_open])
+    def approve(self):
+        pass
+
+    @transition(field=state, source="new", target="shipped", conditions=[has_documents, is_paid, is_open])
+    def ship(self):
+        pass
+
+    @transition(field=state, source="new", target="archived", conditions=[has_documents])
+    def archive(self):
+        pass
+
+
+class ConditionCacheTest(TestCase):
+    def setUp(self):
+        self.model = OrderWithSharedConditions()
+        del calls[:]
+
+    def test_conditions_evaluated_once_per_availability_check(self):
+        transitions = self.model.get_available_state_transitions()
+        self.assertEqual(set(["approve", "archive", "ship"]), set(transition.name for transition in transitions))
+        self.assertEqual(["is_paid", "is_open", "has_documents", "is_open"], calls)
+
+        list(self.model.get_available_state_transitions())
+        self.assertEqual(8, len(calls))
+
+    def test_condition_cache_context(self):
+        with condition_cache():
+            list(self.model.get_available_state_transitions())
+            self.assertTrue(can_proceed(self.model.approve))
+        self.assertEqual(["is_paid", "is_open", "has_documents", "is_open", "is_open"], calls)
+
+    def test_transition_checks_conditions_again(self):
+        with condition_cache():
+            self.assertTrue(can_proceed(self.model.approve))
+            self.model.approve()
+        self.assertEqual(["is_paid", "is_open", "has_documents"] * 2, calls)
@@ -0,0 +1,241 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+try:
+    from unittest import mock
+except ImportError:  # python 2.7
+    import mock
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from django.core.management import call_command
+from django.db import models
+from django.test import TestCase
+
+from django_fsm import FSMField, transition
+from django_fsm.graph import StateGraph
+from django_fsm.management.commands.graph_transitions import generate_dot, write_dot, write_mermaid, write_split
+from django_fsm.tests.test_basic_transitions import BlogPost
+from django_fsm.tests.test_conditions import BlogPostWithConditions
+
+
+class StateGraphTest(TestCase):
+    def setUp(self):
+        self.graph = StateGraph(BlogPost._meta.get_field("state"), BlogPost)
+
+    def test_wildcard_edges_are_symbolic(self):
+        self.assertEqual(
+            [("+", "blocked", "block"), ("*", "", "empty"), ("*", "moderated", "moderate")],
+            self.graph.wildcard_edges,
+        )
+        self.assertEqual(
+            set(
+                [
+                    ("published", "hidden", "hide"),
+                    ("published", "published", "notify_all"),
+                    ("published", "stolen", "steal"),
+                    ("hidden", "stolen", "steal"),
+                ]
+            ),
+            set(edge for edge in self.graph.edges if edge[0] in ("published", "hidden")),
+        )
+
+    def test_expand_wildcards(self):
+        expanded = list(self.graph.expand_wildcards())
+        states = len(self.graph.states)
+        self.assertEqual(3 * states - 1, len(expanded))
+        self.assertNotIn(("blocked", "blocked", "block"), expanded)
+        self.assertIn(("moderated", "moderated", "moderate"), expanded)
+
+    def test_no_final_states_with_any_state_transition(self):
+        self.assertEqual([], self.graph.final_states())
+
+    def test_collapsed_wildcards(self):
+        field = BlogPost._meta.get_field("state")
+        expanded = generate_dot([(field, BlogPost)]).source
+        collapsed = generate_dot([(field, BlogPost)], collapse_wildcards=True).source
+        self.assertIn('label="any state"', collapsed)
+        self.assertEqual(3, collapsed.count("state._any\" ->"))
+        self.assertLess(collapsed.count("->"), expanded.count("->"))
+
+
+class Ticket(models.Model):
+    state = FSMField(default="new")
+
+    @transition(field=state, source="new", target="open")
+    def open(self):
+        pass
+
+    @transition(field=state, source="open", target="closed", on_error="failed")
+    def close(self):
+        pass
+
+    @transition(field=state, source="open", target="waiting")
+    def wait(self):
+        pass
+
+    @transition(field=state, source="waiting", target="open")
+    def resume(self):
+        pass
+
+    @transition(field=state, source="open", target="limbo")
+    def escalate(self):
+        pass
+
+    @transition(field=state, source="limbo", target="nowhere")
+    def forward(self):
+        pass
+
+    @transition(field=state, source="nowhere", target="limbo")
+    def backward(self):
+        pass
+
+    @transition(field=state, source="archived", target="closed")
+    def restore(self):
+        pass
+
+
+class StateGraphAnalysisTest(TestCase):
+    def setUp(self):
+        self.graph = Ticket._meta.get_field("state").graph(Ticket)
+
+    def test_graph_cached(self):
+        self.assertIs(self.graph, Ticket._meta.get_field("state").graph(Ticket))
+
+    def test_initial_and_terminal_states(self):
+        self.assertEqual("new", self.graph.initial_state)
+        self.assertEqual(set(["closed", "failed"]), set(self.graph.terminal_states))
+
+    def test_unreachable_states(self):
+        self.assertEqual(["archived"], self.graph.unreachable_states)
+        self.assertNotIn("archived", self.graph.reachable_states)
+
+    def test_dead_end_states(self):
+        self.assertEqual(set(["limbo", "nowhere"]), set(self.graph.dead_end_states))
+
+    def test_strongly_connected_components(self):
+        components = set(frozenset(component) for component in self.graph.strongly_connected_components)
+        self.assertEqual(
+            set(
+                [
+                    frozenset(["open", "waiting"]),
+                    frozenset(["limbo", "nowhere"]),
+                    frozenset(["new"]),
+                    frozenset(["closed"]),
+                    frozenset(["failed"]),
+                    frozenset(["archived"]),
+                ]
+            ),
+            components,
+        )
+
+    def test_edges(self):
+        self.assertEqual(
+            set([("new", "open", "open"), ("waiting", "open", "resume")]), set(self.graph.in_edges("open"))
+        )
+        self.assertEqual(
+            set(
+                [
+                    ("open", "closed", "close"),
+                    ("open", "failed", None),
+                    ("open", "waiting", "wait"),
+                    ("open", "limbo", "escalate"),
+                ]
+            ),
+            set(self.graph.out_edges("open")),
+        )
+
+    def test_wildcards_expanded(self):
+        graph = BlogPost._meta.get_field("state").graph(BlogPost)
+        self.assertIn(("hidden", "moderated", "moderate"), graph.out_edges("hidden"))
+        self.assertNotIn(("blocked", "blocked", "block"), graph.out_edges("blocked"))
+        self.assertEqual([], graph.dead_end_states)
+        self.assertEqual([], graph.unreachable_states)
+
+
+class GraphExportTest(TestCase):
+    def setUp(self):
+        self.fields_data = [(BlogPost._meta.get_field("state"), BlogPost)]
+
+    def export(self, *args):
+        out = StringIO()
+        with mock.patch.dict(sys.modules, {"graphviz": None}):
+            call_command("graph_transitions", "django_fsm.BlogPost", *args, stdout=out)
+        return out.getvalue()
+
+    def test_dot_text_matches_graphviz(self):
+        out = StringIO()
+        write_dot(self.fields_data, out)
+        self.assertEqual(generate_dot(self.fields_data).source.count("->"), out.getvalue().count("->"))
+        self.assertEqual(out.getvalue(), self.export())
+
+    def test_json(self):
+        data = json.loads(self.export("--format", "json"))
+        field = data["fields"][0]
+        self.assertEqual(("django_fsm", "BlogPost", "state", "new"), (
+            field["app_label"], field["model"], field["field"], field["initial"]
+        ))
+        self.assertIn({"source": "*", "target": "moderated", "name": "moderate"}, field["wildcard_transitions"])
+        self.assertIn(
+            {"source": "hidden", "transitions": [{"target": "stolen", "name": "steal"}]},
+            field["adjacency"],
+        )
+
+    def test_export_does_not_cache_graphs(self):
+        field = BlogPost._meta.get_field("state")
+        field.state_graphs.clear()
+        for args in [(), ("--format", "json"), ("--format", "mermaid")]:
+            self.export(*args)
+        self.assertEqual({}, field.state_graphs)
+
+    def test_mermaid(self):
+        out = StringIO()
+        write_mermaid(self.fields_data, out, collapse_wildcards=True)
+        self.assertEqual(out.getvalue(), self.export("--format", "mermaid", "--collapse-wildcards"))
+        self.assertTrue(out.getvalue().startswith("stateDiagram-v2\n"))
+        self.assertIn("django_fsm_BlogPost_state_any --> ", out.getvalue())
+
+
+class SplitGraphExportTest(TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.fields_data = [
+            (BlogPost._meta.get_field("state"), BlogPost),
+            (BlogPostWithConditions._meta.get_field("state"), BlogPostWithConditions),
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_file_per_field(self):
+        written, unchanged = write_split(self.fields_data, self.output_dir, extension="json")
+        self.assertEqual(["django_fsm.BlogPost.state.json", "django_fsm.BlogPostWithConditions.state.json"], written)
+        self.assertEqual([], unchanged)
+        with open(os.path.join(self.output_dir, written[0])) as f:
+            self.assertEqual("BlogPost", json.load(f)["fields"][0]["model"])
+
+    def test_unchanged_fields_skipped(self):
+        write_split(self.fields_data, self.output_dir)
+        self.assertEqual(([], ["django_fsm.BlogPost.state.dot", "django_fsm.BlogPostWithConditions.state.dot"]),
+                         write_split(self.fields_data, self.output_dir))
+
+        os.remove(os.path.join(self.output_dir, "django_fsm.BlogPost.state.dot"))
+        self.assertEqual(["django_fsm.BlogPost.state.dot"], write_split(self.fields_data, self.output_dir)[0])
+        self.assertEqual(2, len(write_split(self.fields_data, self.output_dir, force=True)[0]))
+        self.assertEqual(2, len(write_split(self.fields_data, self.output_dir, collapse_wildcards=True)[0]))
+
+    def test_fingerprint_changes_with_transitions(self):
+        write_split(self.fields_data, self.output_dir)
+        meta = BlogPost.hide._django_fsm
+        transition = meta.transitions["published"]
+        try:
+            transition.target = "archived"
+            self.assertEqual(["django_fsm.BlogPost.state.dot"], write_split(self.fields_data, self.output_dir)[0])
+        finally:
+            transition.target = "hidden"
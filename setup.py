@@ -13,7 +13,17 @@ setup(
     author_email="kmmbvnr@gmail.com",
     url="http://github.com/kmmbvnr/django-fsm",
     keywords="django",
-    packages=["django_fsm", "django_fsm.management", "django_fsm.management.commands"],
+    packages=[
+        "django_fsm",
+        "django_fsm.log",
+        "django_fsm.log.migrations",
+        "django_fsm.counters",
+        "django_fsm.counters.management",
+        "django_fsm.counters.management.commands",
+        "django_fsm.counters.migrations",
+        "django_fsm.management",
+        "django_fsm.management.commands",
+    ],
     include_package_data=True,
     zip_safe=False,
     license="MIT License",
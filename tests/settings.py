@@ -2,6 +2,8 @@ import django
 
 PROJECT_APPS = (
     "django_fsm",
+    "django_fsm.log",
+    "django_fsm.counters",
     "testapp",
 )
 
@@ -40,6 +42,8 @@ else:
         "auth": None,
         "contenttypes": None,
         "guardian": None,
+        "fsm_log": None,
+        "fsm_counters": None,
     }
 
 
@@ -0,0 +1,167 @@
+import unittest
+
+import django
+from django.db import models
+from django.test import TestCase
+
+from django_fsm import (
+    ConcurrentTransition,
+    ConcurrentTransitionMixin,
+    FSMField,
+    FSMQuerySet,
+    GET_STATE,
+    TransitionNotAllowed,
+    can_proceed,
+    run_transition,
+    transition,
+)
+from django_fsm.signals import pre_transition, post_transition
+
+
+class AsyncBlogPost(ConcurrentTransitionMixin, models.Model):
+    state = FSMField(default="new")
+    text = models.CharField(max_length=50, blank=True)
+
+    objects = FSMQuerySet.as_manager()
+
+    @transition(field=state, source="new", target="published")
+    async def publish(self, text=""):
+        self.text = text
+        return "done"
+
+    @transition(field=state, source="published", target="hidden", conditions=[lambda post: post.text != "sticky"])
+    async def hide(self):
+        pass
+
+    @transition(field=state, source="published", target="removed", on_error="failed")
+    async def remove(self):
+        raise Exception("Upss")
+
+    @transition(
+        field=state,
+        source="new",
+        target=GET_STATE(lambda post, target: target, states=["draft", "review"]),
+    )
+    async def route(self, target):
+        pass
+
+    @transition(field=state, source="new", target="archived")
+    def archive(self):
+        pass
+
+    class Meta:
+        app_label = "testapp"
+
+
+class AsyncTransitionTests(TestCase):
+    def setUp(self):
+        self.signals = []
+        pre_transition.connect(self.on_pre_transition, sender=AsyncBlogPost)
+        post_transition.connect(self.on_post_transition, sender=AsyncBlogPost)
+
+    def tearDown(self):
+        pre_transition.disconnect(self.on_pre_transition, sender=AsyncBlogPost)
+        post_transition.disconnect(self.on_post_transition, sender=AsyncBlogPost)
+
+    def on_pre_transition(self, sender, instance, name, source, target, **kwargs):
+        self.signals.append(("pre", name, source, target))
+
+    def on_post_transition(self, sender, instance, name, source, target, **kwargs):
+        self.signals.append(("post", name, source, target))
+
+    async def test_async_transition(self):
+        post = AsyncBlogPost()
+        self.assertTrue(can_proceed(post.publish))
+        self.assertEqual("done", await post.publish(text="hello"))
+        self.assertEqual("published", post.state)
+        self.assertEqual("hello", post.text)
+        self.assertEqual([("pre", "publish", "new", "published"), ("post", "publish", "new", "published")], self.signals)
+
+    async def test_not_allowed(self):
+        post = AsyncBlogPost()
+        with self.assertRaises(TransitionNotAllowed):
+            await post.hide()
+        self.assertEqual([], self.signals)
+
+    async def test_conditions_not_met(self):
+        post = AsyncBlogPost(state="published", text="sticky")
+        with self.assertRaises(TransitionNotAllowed):
+            await post.hide()
+
+    async def test_on_error_state(self):
+        post = AsyncBlogPost(state="published")
+        with self.assertRaises(Exception):
+            await post.remove()
+        self.assertEqual("failed", post.state)
+        self.assertEqual(("post", "remove", "published", "failed"), self.signals[-1])
+
+    async def test_get_state_target(self):
+        post = AsyncBlogPost()
+        await post.route("review")
+        self.assertEqual("review", post.state)
+
+    def test_sync_transition_unaffected(self):
+        post = AsyncBlogPost()
+        post.archive()
+        self.assertEqual("archived", post.state)
+
+    def test_lock_not_supported(self):
+        with self.assertRaises(ValueError):
+
+            @transition(field="state", lock=True)
+            async def publish(self):
+                pass
+
+
+@unittest.skipIf(django.VERSION < (4, 2), "Async model methods are available on django 4.2+")
+class AsyncLockMixinTests(TestCase):
+    async def test_asave(self):
+        post = await AsyncBlogPost.objects.acreate()
+        await post.publish()
+        await post.asave()
+        self.assertEqual("published", (await AsyncBlogPost.objects.aget(pk=post.pk)).state)
+
+        await post.hide()
+        await post.asave()
+
+    async def test_concurrent_modifications_raise_exception(self):
+        post1 = await AsyncBlogPost.objects.acreate()
+        post2 = await AsyncBlogPost.objects.aget(pk=post1.pk)
+
+        await post1.publish()
+        await post1.asave()
+
+        await post2.publish()
+        with self.assertRaises(ConcurrentTransition) as context:
+            await post2.asave()
+        self.assertEqual({"state": "published"}, context.exception.current_states)
+
+    async def test_concurrent_modifications_after_refresh_db_succeed(self):
+        post1 = await AsyncBlogPost.objects.acreate()
+        post2 = await AsyncBlogPost.objects.aget(pk=post1.pk)
+
+        await post1.publish()
+        await post1.asave()
+
+        await post2.arefresh_from_db()
+        await post2.hide()
+        await post2.asave()
+
+
+class AsyncTransitionSyncRunnersTests(TestCase):
+    def setUp(self):
+        self.post = AsyncBlogPost.objects.create()
+
+    def test_per_instance_bulk_transition_rejected(self):
+        with self.assertRaises(ValueError):
+            AsyncBlogPost.objects.fsm_transition("publish", per_instance=True)
+        self.assertEqual("new", AsyncBlogPost.objects.get().state)
+
+    def test_bulk_update_allowed(self):
+        self.assertEqual(1, AsyncBlogPost.objects.fsm_transition("publish", skip_method=True))
+        self.assertEqual("published", AsyncBlogPost.objects.get().state)
+
+    def test_run_transition_rejected(self):
+        with self.assertRaises(ValueError):
+            run_transition(self.post, "publish")
+        self.assertEqual("new", AsyncBlogPost.objects.get().state)
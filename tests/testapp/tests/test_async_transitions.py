@@ -0,0 +1,9 @@
+import sys
+
+# async def is a syntax error before python 3.5
+if sys.version_info >= (3, 5):
+    from testapp.tests.async_transitions import (  # noqa: F401
+        AsyncLockMixinTests,
+        AsyncTransitionSyncRunnersTests,
+        AsyncTransitionTests,
+    )
@@ -0,0 +1,327 @@
+try:
+    from unittest import mock
+except ImportError:  # python 2.7
+    import mock
+
+from django.contrib.auth.models import User
+from django.db import models
+from django.db.models import Q
+from django.test import TestCase
+
+from django_fsm import FSMField, FSMQuerySet, TransitionNotAllowed, can_proceed, condition, transition
+from django_fsm.signals import pre_bulk_transition, post_bulk_transition, post_transition
+
+
+class BulkOrder(models.Model):
+    state = FSMField(default="new")
+    note = models.CharField(max_length=50, blank=True)
+
+    objects = FSMQuerySet.as_manager()
+
+    @transition(field=state, source=["new", "pending"], target="expired")
+    def expire(self):
+        self.note = "expired"
+
+    @transition(field=state, source="new", target="pending")
+    @transition(field=state, source="pending", target="paid")
+    def advance(self):
+        pass
+
+    @transition(field=state, source="+", target="cancelled")
+    def cancel(self):
+        pass
+
+    @transition(field=state, source="paid", target="shipped", conditions=[lambda order: order.note != "hold"])
+    def ship(self):
+        self.note = "shipped"
+
+    @transition(field=state, source="new")
+    def touch(self):
+        pass
+
+    @transition(field=state, source="new", target="archived")
+    def archive(self):
+        if self.note == "fail":
+            raise Exception("Upss")
+
+    class Meta:
+        app_label = "testapp"
+
+
+class BulkTransitionTests(TestCase):
+    def setUp(self):
+        for state in ["new", "new", "pending", "paid", "cancelled"]:
+            BulkOrder.objects.create(state=state)
+
+    def states(self):
+        return sorted(BulkOrder.objects.values_list("state", flat=True))
+
+    def test_single_target_update(self):
+        self.assertEqual(3, BulkOrder.objects.fsm_transition("expire", skip_method=True))
+        self.assertEqual(["cancelled", "expired", "expired", "expired", "paid"], self.states())
+        self.assertEqual(0, BulkOrder.objects.exclude(note="").count())
+
+    def test_method_body_skipped_only_explicitly(self):
+        with self.assertRaises(ValueError):
+            BulkOrder.objects.fsm_transition("expire")
+        self.assertEqual(0, BulkOrder.objects.filter(state="expired").count())
+        self.assertEqual(3, BulkOrder.objects.fsm_transition("expire", per_instance=True))
+        self.assertEqual(3, BulkOrder.objects.filter(note="expired").count())
+
+    def test_multiple_targets_do_not_chain(self):
+        self.assertEqual(3, BulkOrder.objects.fsm_transition("advance", skip_method=True))
+        self.assertEqual(["cancelled", "paid", "paid", "pending", "pending"], self.states())
+
+    def test_plus_source_skips_target_state(self):
+        self.assertEqual(4, BulkOrder.objects.filter(pk__gt=0).fsm_transition("cancel", skip_method=True))
+        self.assertEqual(["cancelled"] * 5, self.states())
+
+    def test_chunked_update(self):
+        self.assertEqual(3, BulkOrder.objects.fsm_transition("advance", chunk_size=2, skip_method=True))
+        self.assertEqual(["cancelled", "paid", "paid", "pending", "pending"], self.states())
+
+    def test_conditions_rejected(self):
+        with self.assertRaises(ValueError):
+            BulkOrder.objects.fsm_transition("ship", skip_method=True)
+
+    def test_empty_target_rejected(self):
+        with self.assertRaises(ValueError):
+            BulkOrder.objects.fsm_transition("touch", skip_method=True)
+
+    def test_not_a_transition(self):
+        with self.assertRaises(TypeError):
+            BulkOrder.objects.fsm_transition("save")
+
+    def test_per_instance_checks_conditions_and_runs_method(self):
+        BulkOrder.objects.create(state="paid", note="hold")
+        self.assertEqual(1, BulkOrder.objects.fsm_transition("ship", per_instance=True, chunk_size=1))
+        self.assertEqual(["shipped"], list(BulkOrder.objects.filter(state="shipped").values_list("note", flat=True)))
+        self.assertEqual(1, BulkOrder.objects.filter(state="paid").count())
+
+    def test_per_instance_chunk_rolled_back_on_error(self):
+        BulkOrder.objects.create(state="new", note="fail")
+        with self.assertRaises(Exception):
+            BulkOrder.objects.fsm_transition("archive", per_instance=True, chunk_size=10)
+        self.assertEqual(0, BulkOrder.objects.filter(state="archived").count())
+
+    def test_single_instance_transition_unaffected(self):
+        order = BulkOrder.objects.get(state="paid")
+        with self.assertRaises(TransitionNotAllowed):
+            order.expire()
+
+
+class BulkTransitionSignalsTests(TestCase):
+    def setUp(self):
+        for state in ["new", "new", "pending", "paid"]:
+            BulkOrder.objects.create(state=state)
+        self.pre_calls, self.post_calls, self.post_transition_calls = [], [], []
+        pre_bulk_transition.connect(self.on_pre_bulk_transition, sender=BulkOrder)
+        post_bulk_transition.connect(self.on_post_bulk_transition, sender=BulkOrder)
+        post_transition.connect(self.on_post_transition, sender=BulkOrder)
+
+    def tearDown(self):
+        pre_bulk_transition.disconnect(self.on_pre_bulk_transition, sender=BulkOrder)
+        post_bulk_transition.disconnect(self.on_post_bulk_transition, sender=BulkOrder)
+        post_transition.disconnect(self.on_post_transition, sender=BulkOrder)
+
+    def on_pre_bulk_transition(self, sender, name, field, transitions, pks, instances, **kwargs):
+        self.assertEqual(len(pks), BulkOrder.objects.filter(pk__in=pks, state__in=["new", "pending"]).count())
+        self.pre_calls.append((name, transitions, sorted(pks), instances))
+
+    def on_post_bulk_transition(self, sender, name, field, transitions, pks, instances, **kwargs):
+        self.assertEqual(len(pks), BulkOrder.objects.filter(pk__in=pks, state__in=["pending", "paid"]).count())
+        self.post_calls.append((name, transitions, sorted(pks), instances))
+
+    def on_post_transition(self, sender, instance, name, **kwargs):
+        self.post_transition_calls.append(instance.pk)
+
+    def test_signals_sent_once_per_update(self):
+        pks = sorted(BulkOrder.objects.filter(state__in=["new", "pending"]).values_list("pk", flat=True))
+        BulkOrder.objects.fsm_transition("advance", skip_method=True)
+        expected = [("advance", {"new": "pending", "pending": "paid"}, pks, None)]
+        self.assertEqual(expected, self.pre_calls)
+        self.assertEqual(expected, self.post_calls)
+        self.assertEqual([], self.post_transition_calls)
+
+    def test_signals_sent_once_per_chunk(self):
+        BulkOrder.objects.fsm_transition("advance", chunk_size=2, skip_method=True)
+        self.assertEqual([2, 1], [len(pks) for _, _, pks, _ in self.pre_calls])
+        self.assertEqual([2, 1], [len(pks) for _, _, pks, _ in self.post_calls])
+
+    def test_signals_sent_per_bounded_chunk_by_default(self):
+        with mock.patch.object(FSMQuerySet, "pks_chunk_size", 2):
+            BulkOrder.objects.fsm_transition("advance", skip_method=True)
+        self.assertEqual([2, 1], [len(pks) for _, _, pks, _ in self.pre_calls])
+        self.assertEqual([2, 1], [len(pks) for _, _, pks, _ in self.post_calls])
+
+    def test_per_instance_signals_carry_instances(self):
+        BulkOrder.objects.fsm_transition("advance", per_instance=True)
+        self.assertEqual(1, len(self.post_calls))
+        _, _, pks, instances = self.post_calls[0]
+        self.assertEqual(pks, sorted(instance.pk for instance in instances))
+        self.assertEqual(sorted(self.post_transition_calls), pks)
+
+
+class AnnotateAvailableTransitionsTests(TestCase):
+    def setUp(self):
+        for state in ["new", "pending", "paid", "cancelled", "archived"]:
+            BulkOrder.objects.create(state=state)
+
+    def test_annotation_matches_available_transitions(self):
+        for order in BulkOrder.objects.annotate_available_transitions("state"):
+            expected = [
+                transition.name for transition in order.get_available_state_transitions() if not transition.conditions
+            ]
+            self.assertEqual(sorted(expected), sorted(order.available_state_transitions))
+
+    def test_annotation_values(self):
+        actual = dict(BulkOrder.objects.annotate_available_transitions("state", alias="actions").values_list("state", "actions"))
+        self.assertEqual(["advance", "archive", "cancel", "expire", "touch"], sorted(actual["new"]))
+        self.assertEqual(["cancel"], actual["paid"])
+        self.assertEqual([], actual["cancelled"])
+        self.assertEqual(["cancel"], actual["archived"])
+
+    def test_filter_on_annotation(self):
+        queryset = BulkOrder.objects.annotate_available_transitions("state").filter(available_state_transitions="")
+        self.assertEqual(["cancelled"], list(queryset.values_list("state", flat=True)))
+
+
+class FilterCanProceedTests(TestCase):
+    def setUp(self):
+        for state in ["new", "pending", "paid", "cancelled", "archived"]:
+            BulkOrder.objects.create(state=state)
+
+    def states(self, queryset):
+        return sorted(queryset.values_list("state", flat=True))
+
+    def test_explicit_sources(self):
+        self.assertEqual(["new", "pending"], self.states(BulkOrder.objects.filter_can_proceed("expire")))
+        self.assertEqual(
+            ["archived", "cancelled", "paid"], self.states(BulkOrder.objects.exclude_can_proceed("expire"))
+        )
+
+    def test_plus_source(self):
+        self.assertEqual(
+            ["archived", "new", "paid", "pending"], self.states(BulkOrder.objects.filter_can_proceed("cancel"))
+        )
+        self.assertEqual(["cancelled"], self.states(BulkOrder.objects.exclude_can_proceed("cancel")))
+
+    def test_conditions_without_q_rejected(self):
+        with self.assertRaises(ValueError):
+            BulkOrder.objects.filter_can_proceed("ship")
+
+    def test_conditions_not_checked(self):
+        BulkOrder.objects.filter(state="paid").update(note="hold")
+        self.assertEqual(["paid"], self.states(BulkOrder.objects.filter_can_proceed("ship", check_conditions=False)))
+
+    def test_matches_can_proceed(self):
+        for name in ["expire", "advance", "cancel", "touch"]:
+            expected = [order.pk for order in BulkOrder.objects.all() if can_proceed(getattr(order, name))]
+            self.assertEqual(sorted(expected), sorted(BulkOrder.objects.filter_can_proceed(name).values_list("pk", flat=True)))
+
+
+@condition(q=Q(paid=True))
+def is_paid(order):
+    return order.paid
+
+
+@condition(q=Q(note=""))
+def is_not_held(order):
+    return order.note == ""
+
+
+class QConditionOrder(models.Model):
+    state = FSMField(default="new")
+    paid = models.BooleanField(default=False)
+    note = models.CharField(max_length=50, blank=True)
+
+    objects = FSMQuerySet.as_manager()
+
+    @transition(field=state, source="new", target="approved", conditions=[is_paid, is_not_held])
+    @transition(field=state, source="held", target="approved", conditions=[is_paid])
+    def approve(self):
+        pass
+
+    @transition(field=state, source="*", target="cancelled", conditions=[is_not_held])
+    def cancel(self):
+        pass
+
+    @transition(field=state, source="new", target="held")
+    def hold(self):
+        pass
+
+    class Meta:
+        app_label = "testapp"
+
+
+class QConditionTests(TestCase):
+    def setUp(self):
+        for state, paid, note in [
+            ("new", False, ""),
+            ("new", True, ""),
+            ("new", True, "hold"),
+            ("held", True, "hold"),
+            ("held", False, ""),
+        ]:
+            QConditionOrder.objects.create(state=state, paid=paid, note=note)
+
+    def test_python_conditions_still_work(self):
+        order = QConditionOrder.objects.get(state="new", paid=True, note="")
+        self.assertTrue(can_proceed(order.approve))
+        order = QConditionOrder.objects.get(state="new", paid=True, note="hold")
+        self.assertFalse(can_proceed(order.approve))
+
+    def test_filter_can_proceed_matches_can_proceed(self):
+        for name in ["approve", "cancel", "hold"]:
+            expected = [order.pk for order in QConditionOrder.objects.all() if can_proceed(getattr(order, name))]
+            actual = QConditionOrder.objects.filter_can_proceed(name).values_list("pk", flat=True)
+            self.assertEqual(sorted(expected), sorted(actual))
+            excluded = QConditionOrder.objects.exclude_can_proceed(name).values_list("pk", flat=True)
+            self.assertEqual(5, len(expected) + len(excluded))
+
+    def test_annotation_matches_available_transitions(self):
+        for order in QConditionOrder.objects.annotate_available_transitions("state"):
+            expected = [transition.name for transition in order.get_available_state_transitions()]
+            self.assertEqual(sorted(expected), sorted(order.available_state_transitions))
+
+    def test_bulk_transition_checks_conditions(self):
+        self.assertEqual(2, QConditionOrder.objects.fsm_transition("approve", skip_method=True))
+        self.assertEqual(
+            [("held", False), ("new", False), ("new", True)],
+            sorted(QConditionOrder.objects.exclude(state="approved").values_list("state", "paid")),
+        )
+
+
+@condition(q=Q(owner__is_active=True))
+def owner_is_active(order):
+    return order.owner.is_active
+
+
+class OwnedOrder(models.Model):
+    state = FSMField(default="new")
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    objects = FSMQuerySet.as_manager()
+
+    @transition(field=state, source="new", target="pending", conditions=[owner_is_active])
+    @transition(field=state, source="pending", target="paid", conditions=[owner_is_active])
+    def advance(self):
+        pass
+
+    class Meta:
+        app_label = "testapp"
+
+
+class RelatedQConditionTests(TestCase):
+    def test_bulk_transition_with_related_condition(self):
+        active = User.objects.create(username="active")
+        inactive = User.objects.create(username="inactive", is_active=False)
+        for state in ["new", "pending"]:
+            OwnedOrder.objects.create(state=state, owner=active)
+            OwnedOrder.objects.create(state=state, owner=inactive)
+
+        self.assertEqual(2, OwnedOrder.objects.fsm_transition("advance", skip_method=True))
+        self.assertEqual(
+            [("new", False), ("paid", True), ("pending", False), ("pending", True)],
+            sorted(OwnedOrder.objects.values_list("state", "owner__is_active")),
+        )
@@ -101,3 +101,23 @@ class TestLockMixin(TestCase):
         post2.refresh_from_db()
         post2.remove()
         post2.save()
+
+    def test_concurrent_modifications_exception_holds_current_state(self):
+        post1 = ExtendedBlogPost.objects.create()
+        post2 = ExtendedBlogPost.objects.get(pk=post1.pk)
+
+        post1.publish()
+        post1.reject()
+        post1.save()
+
+        post2.publish()
+        with self.assertRaises(ConcurrentTransition) as context:
+            post2.save()
+        self.assertIs(post2, context.exception.object)
+        self.assertEqual({"state": "published"}, context.exception.current_states)
+
+    def test_create_with_preset_pk_succeed(self):
+        post = LockedBlogPost(pk=100500, text="test_create_with_preset_pk_succeed")
+        post.publish()
+        post.save()
+        self.assertEqual("published", LockedBlogPost.objects.get(pk=100500).state)
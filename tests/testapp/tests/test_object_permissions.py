@@ -1,3 +1,9 @@
+try:
+    from unittest import mock
+except ImportError:  # python 2.7
+    import mock
+
+from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth.models import User
 from django.db import models
 from django.test import TestCase
@@ -5,7 +11,7 @@ from django.test.utils import override_settings
 
 from guardian.shortcuts import assign_perm
 
-from django_fsm import FSMField, transition, has_transition_perm
+from django_fsm import FSMField, transition, has_transition_perm, bulk_get_available_user_transitions
 
 
 class ObjectPermissionTestModel(models.Model):
@@ -21,6 +27,10 @@ class ObjectPermissionTestModel(models.Model):
     def publish(self):
         pass
 
+    @transition(field=state, source="new", target="hidden")
+    def hide(self):
+        pass
+
     class Meta:
         app_label = "testapp"
 
@@ -47,3 +57,52 @@ class ObjectPermissionFSMFieldTest(TestCase):
 
     def test_object_only_other_access_prohibited(self):
         self.assertFalse(has_transition_perm(self.model.publish, self.unprivileged))
+
+
+class BulkObjectPermissionBackend(object):
+    calls = []
+
+    def bulk_has_perm(self, user_obj, perm, objs):
+        self.calls.append((perm, len(objs)))
+        return [obj.pk % 2 == 0 for obj in objs]
+
+
+@override_settings(
+    AUTHENTICATION_BACKENDS=("django.contrib.auth.backends.ModelBackend", "guardian.backends.ObjectPermissionBackend")
+)
+class BulkObjectPermissionTest(TestCase):
+    def setUp(self):
+        self.models = [ObjectPermissionTestModel.objects.create() for _ in range(4)]
+        self.user = User.objects.create(username="object_only_privileged")
+        assign_perm("can_publish_objectpermissiontestmodel", self.user, self.models[1])
+
+    def available(self, user):
+        return [
+            set(transition.name for transition in transitions)
+            for transitions in bulk_get_available_user_transitions(self.models, user, "state")
+        ]
+
+    def test_object_permissions(self):
+        self.assertEqual(
+            [set(["hide"]), set(["hide", "publish"]), set(["hide"]), set(["hide"])],
+            self.available(self.user),
+        )
+
+    def test_global_permission(self):
+        assign_perm("testapp.can_publish_objectpermissiontestmodel", self.user)
+        self.assertEqual([set(["hide", "publish"])] * 4, self.available(self.user))
+
+    def test_superuser(self):
+        superuser = User.objects.create(username="superuser", is_superuser=True)
+        self.assertEqual([set(["hide", "publish"])] * 4, self.available(superuser))
+
+    @mock.patch("django_fsm.get_backends", lambda: [ModelBackend(), BulkObjectPermissionBackend()])
+    def test_backend_bulk_lookup(self):
+        BulkObjectPermissionBackend.calls = []
+        expected = [set(["hide", "publish"]) if model.pk % 2 == 0 else set(["hide"]) for model in self.models]
+        self.assertEqual(expected, self.available(self.user))
+        self.assertEqual([("testapp.can_publish_objectpermissiontestmodel", 4)], BulkObjectPermissionBackend.calls)
+
+    def test_matches_single_instance_lookup(self):
+        for model, transitions in zip(self.models, bulk_get_available_user_transitions(self.models, self.user, "state")):
+            self.assertEqual(list(model.get_available_user_state_transitions(self.user)), transitions)
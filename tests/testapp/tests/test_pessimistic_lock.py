@@ -0,0 +1,77 @@
+import unittest
+
+from django.db import connection, models, transaction
+from django.db.transaction import TransactionManagementError
+from django.test import TestCase, TransactionTestCase
+from django_fsm import ConcurrentTransition, ConcurrentTransitionMixin, FSMField, TransitionNotAllowed, transition
+
+
+class PessimisticBlogPost(ConcurrentTransitionMixin, models.Model):
+    state = FSMField(default="new", protected=True)
+
+    @transition(field=state, source="new", target="published", lock=True)
+    def publish(self):
+        pass
+
+    @transition(field=state, source=["new", "published"], target="removed", lock=True)
+    def remove(self):
+        pass
+
+    @transition(field=state, source="published", target="hidden", lock="nowait")
+    def hide(self):
+        pass
+
+    class Meta:
+        app_label = "testapp"
+
+
+class PessimisticLockTests(TestCase):
+    def test_unsaved_instance_not_locked(self):
+        post = PessimisticBlogPost()
+        post.publish()
+        post.save()
+        self.assertEqual("published", PessimisticBlogPost.objects.get(pk=post.pk).state)
+
+    def test_state_reloaded_before_transition(self):
+        post1 = PessimisticBlogPost.objects.create()
+        post2 = PessimisticBlogPost.objects.get(pk=post1.pk)
+
+        with transaction.atomic():
+            post1.publish()
+            post1.save()
+
+        with transaction.atomic():
+            with self.assertRaises(TransitionNotAllowed):
+                post2.publish()
+            self.assertEqual("published", post2.state)
+
+    def test_stale_instance_saves_after_lock(self):
+        post1 = PessimisticBlogPost.objects.create()
+        post2 = PessimisticBlogPost.objects.get(pk=post1.pk)
+
+        with transaction.atomic():
+            post1.publish()
+            post1.save()
+
+        with transaction.atomic():
+            post2.remove()
+            post2.save()
+        self.assertEqual("removed", PessimisticBlogPost.objects.get(pk=post1.pk).state)
+
+    def test_deleted_row(self):
+        post = PessimisticBlogPost.objects.create()
+        PessimisticBlogPost.objects.filter(pk=post.pk).delete()
+        with self.assertRaises(ConcurrentTransition):
+            post.publish()
+
+    def test_unknown_lock_mode(self):
+        with self.assertRaises(ValueError):
+            transition(field="state", lock="wait")
+
+
+@unittest.skipUnless(connection.features.has_select_for_update, "Database has no SELECT ... FOR UPDATE support")
+class PessimisticLockAutocommitTests(TransactionTestCase):
+    def test_lock_requires_atomic_block(self):
+        post = PessimisticBlogPost.objects.create()
+        with self.assertRaises(TransactionManagementError):
+            post.publish()
@@ -0,0 +1,110 @@
+try:
+    from unittest import mock
+except ImportError:  # python 2.7
+    import mock
+
+import django_fsm
+from django.contrib.auth.models import User
+from django.db import models
+from django.test import TestCase
+from django_fsm import FSMField, plan_transitions, transition
+
+
+def is_urgent(instance):
+    return instance.urgent
+
+
+def is_staff(instance, user):
+    return user.is_staff
+
+
+class SupportTicket(models.Model):
+    state = FSMField(default="new")
+    urgent = models.BooleanField(default=False)
+
+    @transition(field=state, source="new", target="open")
+    def open(self):
+        pass
+
+    @transition(field=state, source="open", target="resolved")
+    def resolve(self):
+        pass
+
+    @transition(field=state, source="resolved", target="closed")
+    def close(self):
+        pass
+
+    @transition(field=state, source="open", target="closed", conditions=[is_urgent], permission=is_staff)
+    def close_urgent(self):
+        pass
+
+    @transition(field=state, source="+", target="cancelled")
+    def cancel(self):
+        pass
+
+    class Meta:
+        app_label = "testapp"
+
+
+class PlanTransitionsTest(TestCase):
+    def setUp(self):
+        self.ticket = SupportTicket()
+
+    def names(self, plan):
+        return [transition.name for transition in plan]
+
+    def test_shortest_plan(self):
+        self.assertEqual(["open", "close_urgent"], self.names(plan_transitions(self.ticket, "closed")))
+
+    def test_plan_can_be_run(self):
+        for step in plan_transitions(self.ticket, "closed", check_conditions=True):
+            getattr(self.ticket, step.name)()
+        self.assertEqual("closed", self.ticket.state)
+
+    def test_already_in_target_state(self):
+        self.assertEqual([], plan_transitions(self.ticket, "new"))
+
+    def test_unreachable_state(self):
+        self.ticket.state = "cancelled"
+        self.assertIsNone(plan_transitions(self.ticket, "open"))
+
+    def test_wildcard_from_undeclared_state(self):
+        self.ticket.state = "archived"
+        self.assertEqual(["cancel"], self.names(plan_transitions(self.ticket, "cancelled")))
+
+    def test_check_conditions(self):
+        self.assertEqual(
+            ["open", "resolve", "close"], self.names(plan_transitions(self.ticket, "closed", check_conditions=True))
+        )
+        self.ticket.urgent = True
+        self.assertEqual(
+            ["open", "close_urgent"], self.names(plan_transitions(self.ticket, "closed", check_conditions=True))
+        )
+
+    def test_user_permissions(self):
+        self.ticket.urgent = True
+        user = User.objects.create(username="support")
+        self.assertEqual(["open", "resolve", "close"], self.names(plan_transitions(self.ticket, "closed", user=user)))
+        user.is_staff = True
+        self.assertEqual(["open", "close_urgent"], self.names(plan_transitions(self.ticket, "closed", user=user)))
+
+    def test_plan_memoised(self):
+        django_fsm.transition_plans.clear()
+        with mock.patch("django_fsm._find_transitions_path", wraps=django_fsm._find_transitions_path) as find:
+            plan_transitions(self.ticket, "closed")
+            plan_transitions(SupportTicket(), "closed")
+            self.assertEqual(1, find.call_count)
+
+            plan_transitions(self.ticket, "closed", check_conditions=True)
+            self.assertEqual(2, find.call_count)
+        self.assertIn((SupportTicket, "state", "new", "closed"), django_fsm.transition_plans)
+
+    def test_unknown_states_not_memoised(self):
+        django_fsm.transition_plans.clear()
+        self.assertIsNone(plan_transitions(self.ticket, "no-such-state"))
+        self.ticket.state = "archived"
+        self.assertEqual(["cancel"], self.names(plan_transitions(self.ticket, "cancelled")))
+        self.assertEqual({}, django_fsm.transition_plans)
+
+    def test_unknown_field(self):
+        self.assertRaises(ValueError, plan_transitions, self.ticket, "closed", field="status")
@@ -0,0 +1,74 @@
+from django.db import models
+from django.test import TestCase
+
+from django_fsm import (
+    ConcurrentTransition,
+    ConcurrentTransitionMixin,
+    FSMField,
+    TransitionNotAllowed,
+    run_transition,
+    transition,
+    transition_attempts,
+    transition_conflicts,
+)
+
+
+class RetryBlogPost(ConcurrentTransitionMixin, models.Model):
+    state = FSMField(default="new", protected=True)
+    text = models.CharField(max_length=50)
+
+    @transition(field=state, source="new", target="published")
+    def publish(self):
+        pass
+
+    @transition(field=state, source=["new", "published"], target="archived")
+    def archive(self, text=""):
+        self.text = text
+
+    class Meta:
+        app_label = "testapp"
+
+
+class RunTransitionTests(TestCase):
+    def setUp(self):
+        self.post = RetryBlogPost.objects.create()
+        self.stale_post = RetryBlogPost.objects.get(pk=self.post.pk)
+        transition_attempts.clear()
+        transition_conflicts.clear()
+
+    def test_no_conflict(self):
+        run_transition(self.post, "publish")
+        self.assertEqual("published", RetryBlogPost.objects.get(pk=self.post.pk).state)
+        self.assertEqual(1, transition_attempts["testapp", "retryblogpost", "publish"])
+        self.assertEqual(0, transition_conflicts["testapp", "retryblogpost", "publish"])
+
+    def test_retry_after_conflict(self):
+        run_transition(self.post, "publish")
+        run_transition(self.stale_post, "archive", backoff=0, method_kwargs={"text": "retried"})
+
+        post = RetryBlogPost.objects.get(pk=self.post.pk)
+        self.assertEqual("archived", post.state)
+        self.assertEqual("retried", post.text)
+        self.assertEqual(2, transition_attempts["testapp", "retryblogpost", "archive"])
+        self.assertEqual(1, transition_conflicts["testapp", "retryblogpost", "archive"])
+
+    def test_already_in_target_state_converges(self):
+        run_transition(self.post, "publish")
+        self.assertIsNone(run_transition(self.stale_post, "publish", backoff=0))
+        self.assertEqual("published", self.stale_post.state)
+        self.assertEqual(2, transition_attempts["testapp", "retryblogpost", "publish"])
+        self.assertEqual(1, transition_conflicts["testapp", "retryblogpost", "publish"])
+
+    def test_not_allowed_after_refresh(self):
+        run_transition(self.post, "archive")
+        with self.assertRaises(TransitionNotAllowed):
+            run_transition(self.stale_post, "publish", backoff=0)
+
+    def test_retries_exhausted(self):
+        run_transition(self.post, "publish")
+        with self.assertRaises(ConcurrentTransition):
+            run_transition(self.stale_post, "archive", retries=0)
+
+    def test_not_a_transition(self):
+        with self.assertRaises(TypeError):
+            run_transition(self.post, "save")
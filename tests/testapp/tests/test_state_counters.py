@@ -0,0 +1,220 @@
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+try:
+    from unittest import mock
+except ImportError:  # python 2.7
+    import mock
+
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import models, transaction
+from django.db.models.deletion import Collector
+from django.db.models.signals import pre_delete
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import isolate_apps
+from django_fsm import ConcurrentTransition, ConcurrentTransitionMixin, FSMField, FSMQuerySet, transition
+from django_fsm.counters.models import StateCounter, StateCounterManager, StateCountersMixin
+
+
+class CountedOrder(StateCountersMixin, models.Model):
+    state = FSMField(default="new", count_states=True)
+    note = models.CharField(max_length=50, blank=True)
+
+    objects = FSMQuerySet.as_manager()
+
+    @transition(field=state, source="new", target="paid")
+    def pay(self):
+        pass
+
+    @transition(field=state, source="paid", target="shipped", on_error="failed")
+    def ship(self, fail=False):
+        if fail:
+            raise Exception("Upss")
+
+    @transition(field=state, source="+", target="cancelled")
+    def cancel(self):
+        pass
+
+    class Meta:
+        app_label = "testapp"
+
+
+class ConcurrentCountedOrder(StateCountersMixin, ConcurrentTransitionMixin, models.Model):
+    state = FSMField(default="new", count_states=True)
+
+    objects = FSMQuerySet.as_manager()
+
+    @transition(field=state, source="new", target="paid")
+    def pay(self):
+        pass
+
+    class Meta:
+        app_label = "testapp"
+
+
+class UncountedOrder(models.Model):
+    state = FSMField(default="new")
+
+    objects = FSMQuerySet.as_manager()
+
+    class Meta:
+        app_label = "testapp"
+
+
+class StateCountersTest(TestCase):
+    def setUp(self):
+        self.orders = [CountedOrder.objects.create() for _ in range(3)]
+
+    def counters(self):
+        return StateCounter.objects.get_counts(CountedOrder, CountedOrder._meta.get_field("state"))
+
+    def test_created_rows_counted(self):
+        self.assertEqual({"new": 3}, self.counters())
+        with self.assertNumQueries(1):
+            self.assertEqual({"new": 3}, CountedOrder.objects.state_counts())
+
+    def test_transition_moves_counters(self):
+        order = self.orders[0]
+        order.pay()
+        order.save()
+        order.ship()
+        order.save()
+        self.assertEqual({"new": 2, "shipped": 1}, CountedOrder.objects.state_counts())
+
+    def test_error_state_counted(self):
+        order = self.orders[0]
+        order.pay()
+        self.assertRaises(Exception, order.ship, fail=True)
+        order.save()
+        self.assertEqual({"new": 2, "failed": 1}, CountedOrder.objects.state_counts())
+
+    def test_unsaved_instance_counted_on_insert(self):
+        order = CountedOrder()
+        order.pay()
+        order.save()
+        self.assertEqual({"new": 3, "paid": 1}, CountedOrder.objects.state_counts())
+
+    def test_transition_without_save_not_counted(self):
+        order = self.orders[0]
+        order.pay()
+        self.assertEqual({"new": 3}, CountedOrder.objects.state_counts())
+        order.delete()
+        self.assertEqual({"new": 2}, CountedOrder.objects.state_counts())
+
+    def test_counted_once_per_save(self):
+        order = self.orders[0]
+        order.pay()
+        order.save()
+        order.save()
+        self.assertEqual({"new": 2, "paid": 1}, CountedOrder.objects.state_counts())
+
+    def test_deferred_state_loaded_before_save(self):
+        order = CountedOrder.objects.only("id").get(pk=self.orders[0].pk)
+        order.pay()
+        order.save()
+        self.assertEqual({"new": 2, "paid": 1}, CountedOrder.objects.state_counts())
+
+    def test_state_not_in_update_fields(self):
+        order = self.orders[0]
+        order.pay()
+        order.save(update_fields=["note"])
+        self.assertEqual({"new": 3}, CountedOrder.objects.state_counts())
+        order.save()
+        self.assertEqual({"new": 2, "paid": 1}, CountedOrder.objects.state_counts())
+
+    def test_delete(self):
+        self.orders[0].delete()
+        self.assertEqual({"new": 2}, CountedOrder.objects.state_counts())
+
+    def test_bulk_transition(self):
+        CountedOrder.objects.filter(pk=self.orders[0].pk).fsm_transition("pay", skip_method=True)
+        self.assertEqual(3, CountedOrder.objects.fsm_transition("cancel", chunk_size=2, skip_method=True))
+        self.assertEqual({"cancelled": 3}, self.counters())
+
+    def test_filtered_queryset_aggregates(self):
+        self.orders[0].pay()
+        self.orders[0].save()
+        queryset = CountedOrder.objects.filter(pk__in=[order.pk for order in self.orders[:2]])
+        self.assertEqual({"new": 1, "paid": 1}, queryset.state_counts())
+
+    def test_uncounted_model_aggregates(self):
+        UncountedOrder.objects.create()
+        UncountedOrder.objects.create(state="done")
+        self.assertEqual({"new": 1, "done": 1}, UncountedOrder.objects.state_counts())
+
+    def test_receivers_connected_to_counted_models_only(self):
+        self.assertTrue(pre_delete.has_listeners(CountedOrder))
+        self.assertFalse(pre_delete.has_listeners(UncountedOrder))
+        self.assertTrue(Collector(using="default").can_fast_delete(UncountedOrder.objects.all()))
+
+    def test_counters_app_required(self):
+        field = CountedOrder._meta.get_field("state")
+        self.assertEqual([], field.check())
+        with mock.patch.object(apps, "is_installed", return_value=False):
+            self.assertEqual(["django_fsm.E001"], [error.id for error in field.check()])
+            self.assertRaises(ImproperlyConfigured, CountedOrder.objects.state_counts)
+            self.assertRaises(ImproperlyConfigured, CountedOrder.objects.fsm_transition, "pay", skip_method=True)
+        self.assertEqual(0, CountedOrder.objects.filter(state="paid").count())
+
+    def test_stale_copies_counted_once(self):
+        first = CountedOrder.objects.get(pk=self.orders[0].pk)
+        second = CountedOrder.objects.get(pk=self.orders[0].pk)
+        first.pay()
+        second.pay()
+        first.save()
+        second.save()
+        self.assertEqual({"new": 2, "paid": 1}, CountedOrder.objects.state_counts())
+
+    def test_delete_counts_stored_state(self):
+        stale = CountedOrder.objects.get(pk=self.orders[0].pk)
+        self.orders[0].pay()
+        self.orders[0].save()
+        stale.delete()
+        self.assertEqual({"new": 2}, CountedOrder.objects.state_counts())
+
+    @isolate_apps("testapp")
+    def test_mixin_required(self):
+        class UnmixedCountedOrder(models.Model):
+            state = FSMField(default="new", count_states=True)
+
+            class Meta:
+                app_label = "testapp"
+
+        field = UnmixedCountedOrder._meta.get_field("state")
+        self.assertEqual(["django_fsm.E002"], [error.id for error in field.check()])
+
+    def test_rebuild_command(self):
+        CountedOrder.objects.filter(pk=self.orders[0].pk).update(state="shipped")
+        StateCounter.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_state_counters", "testapp.CountedOrder", chunk_size=2, stdout=out)
+        self.assertEqual({"new": 2, "shipped": 1}, self.counters())
+        self.assertIn("testapp.CountedOrder.state: 3 rows in 2 states", out.getvalue())
+
+
+class ConcurrentStateCountersTest(TestCase):
+    def test_stale_save_not_counted(self):
+        order = ConcurrentCountedOrder.objects.create()
+        stale = ConcurrentCountedOrder.objects.get(pk=order.pk)
+        order.pay()
+        order.save()
+
+        stale.pay()
+        with self.assertRaises(ConcurrentTransition):
+            with transaction.atomic():
+                stale.save()
+        self.assertEqual({"paid": 1}, ConcurrentCountedOrder.objects.state_counts())
+
+
+class StateCountersTransactionTest(TransactionTestCase):
+    def test_failed_counters_roll_back_save(self):
+        order = CountedOrder.objects.create()
+        order.pay()
+        with mock.patch.object(StateCounterManager, "add", side_effect=RuntimeError):
+            self.assertRaises(RuntimeError, order.save)
+        self.assertEqual("new", CountedOrder.objects.get(pk=order.pk).state)
+        self.assertEqual({"new": 1}, CountedOrder.objects.state_counts())
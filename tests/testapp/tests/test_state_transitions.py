@@ -1,6 +1,12 @@
+try:
+    from unittest import mock
+except ImportError:  # python 2.7
+    import mock
+
+import django_fsm
 from django.db import models
 from django.test import TestCase
-from django_fsm import FSMField, transition
+from django_fsm import FSMField, FSMModelMixin, transition
 
 
 class Insect(models.Model):
@@ -48,6 +54,12 @@ class Butterfly(Insect):
         proxy = True
 
 
+class Pupa(FSMModelMixin, Insect):
+    class Meta:
+        app_label = "testapp"
+        proxy = True
+
+
 class TestStateProxy(TestCase):
     def test_initial_proxy_set_succeed(self):
         insect = Insect()
@@ -64,3 +76,29 @@ class TestStateProxy(TestCase):
 
         insects = Insect.objects.all()
         self.assertEqual(set([Caterpillar, Butterfly]), set(insect.__class__ for insect in insects))
+
+    def test_proxy_model_resolved_once(self):
+        Insect.objects.create(state=Insect.STATE.BUTTERFLY)
+        Insect.objects.create(state=Insect.STATE.BUTTERFLY)
+        Insect._meta.get_field("state").state_proxy_models.clear()
+
+        with mock.patch("django_fsm.get_model", wraps=django_fsm.get_model) as get_model:
+            self.assertEqual([Butterfly, Butterfly], [insect.__class__ for insect in Insect.objects.all()])
+        self.assertEqual(1, get_model.call_count)
+
+    def test_load_proxy_set_from_db(self):
+        Insect.objects.create(state=Insect.STATE.BUTTERFLY)
+        Insect.objects.create(state=Insect.STATE.CATERPILLAR)
+
+        with mock.patch.object(Butterfly, "from_db", wraps=Butterfly.from_db) as from_db:
+            insects = list(Pupa.objects.order_by("state"))
+        self.assertEqual([Butterfly, Caterpillar], [insect.__class__ for insect in insects])
+        self.assertEqual(1, from_db.call_count)
+
+    def test_load_proxy_set_from_db_partial_row(self):
+        Insect.objects.create(state=Insect.STATE.BUTTERFLY)
+        self.assertEqual(Butterfly, Pupa.objects.only("state").get().__class__)
+        self.assertEqual(Pupa, Pupa.objects.only("id").get().__class__)
+
+    def test_proxy_fields_precomputed(self):
+        self.assertEqual([(Insect._meta.get_field("state"), 1)], Pupa._get_state_proxy_fields())
@@ -0,0 +1,99 @@
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.test import TransactionTestCase
+
+from django_fsm import FSMField, transition
+from django_fsm.log.models import TransitionLog
+from django_fsm.log.recorder import recorder
+
+
+class LoggedBlogPost(models.Model):
+    state = FSMField(default="new")
+
+    @transition(field=state, source="new", target="published")
+    def publish(self, by=None):
+        pass
+
+    @transition(field=state, source="published", target="hidden", on_error="failed")
+    def hide(self):
+        raise Exception("Upss")
+
+    class Meta:
+        app_label = "testapp"
+
+
+class TransitionLogTests(TransactionTestCase):
+    def setUp(self):
+        recorder._flush_size = None
+
+    def logs(self):
+        return list(TransitionLog.objects.order_by("pk").values_list("object_id", "transition", "source", "target"))
+
+    def test_autocommit_transition_logged(self):
+        post = LoggedBlogPost.objects.create()
+        post.publish()
+        self.assertEqual([(str(post.pk), "publish", "new", "published")], self.logs())
+
+        log = TransitionLog.objects.get()
+        self.assertEqual(ContentType.objects.get_for_model(LoggedBlogPost), log.content_type)
+        self.assertEqual("state", log.field)
+
+    def test_autocommit_new_object_logged_on_save(self):
+        post = LoggedBlogPost()
+        post.publish()
+        self.assertEqual([], self.logs())
+        post.save()
+        self.assertEqual([(str(post.pk), "publish", "new", "published")], self.logs())
+        post.save()
+        self.assertEqual(1, TransitionLog.objects.count())
+
+    def test_failed_transition_logged(self):
+        post = LoggedBlogPost.objects.create(state="published")
+        with self.assertRaises(Exception):
+            post.hide()
+        self.assertEqual([(str(post.pk), "hide", "published", "failed")], self.logs())
+
+    def test_user_logged(self):
+        user = User.objects.create(username="editor")
+        post = LoggedBlogPost.objects.create()
+        post.publish(by=user)
+        self.assertEqual(user, TransitionLog.objects.get().user)
+
+    def test_written_on_commit(self):
+        with transaction.atomic():
+            post = LoggedBlogPost()
+            post.publish()
+            post.save()
+            self.assertEqual([], self.logs())
+        self.assertEqual([(str(post.pk), "publish", "new", "published")], self.logs())
+
+    def test_rolled_back_transaction_not_logged(self):
+        post = LoggedBlogPost.objects.create()
+        with self.assertRaises(ZeroDivisionError):
+            with transaction.atomic():
+                post.publish()
+                post.save()
+                1 / 0
+        self.assertEqual([], self.logs())
+
+    def test_rolled_back_savepoint_not_logged(self):
+        posts = [LoggedBlogPost.objects.create() for _ in range(2)]
+        with transaction.atomic():
+            posts[0].publish()
+            try:
+                with transaction.atomic():
+                    posts[1].publish()
+                    1 / 0
+            except ZeroDivisionError:
+                pass
+        self.assertEqual([(str(posts[0].pk), "publish", "new", "published")], self.logs())
+
+    def test_flush_size(self):
+        recorder._flush_size = 2
+        posts = [LoggedBlogPost.objects.create() for _ in range(3)]
+        with transaction.atomic():
+            for post in posts:
+                post.publish()
+            self.assertEqual(2, TransitionLog.objects.count())
+        self.assertEqual(3, TransitionLog.objects.count())